@@ -0,0 +1,51 @@
+# appearance_cache.py - Checkbox and radio appearance streams built once per style
+from reportlab.pdfbase.acroform import AcroForm
+from reportlab.pdfbase.pdfdoc import PDFDictionary, PDFStream, PDFStreamFilterZCompress
+
+# Appearance streams kept per process; a form uses only a handful of styles
+APPEARANCE_CACHE_SIZE = 256
+
+# style key -> (content, dictionary entries, lookup string)
+_appearances = {}
+
+
+class SharedAppearanceAcroForm(AcroForm):
+    """AcroForm that draws each checkbox/radio appearance once per style.
+
+    ReportLab already writes identical appearance streams only once per
+    file, but it rebuilds every stream (six per checkbox, six per radio
+    option) before it can tell. Here the stream text is built the first
+    time a style is seen in the process. Every document after that gets a
+    PDFStream for it straight from the cache, shared by all of its widgets
+    with that style.
+    """
+    def __init__(self, canv, **kwargs):
+        AcroForm.__init__(self, canv, **kwargs)
+        self._doc_appearances = {}
+
+    def checkboxAP(self, key, value, **kwargs):
+        style = (key, value, bool(self.canv._doc.compression),
+                 tuple(sorted((name, repr(arg)) for name, arg in kwargs.items())))
+        ap = self._doc_appearances.get(style)
+        if ap is not None:
+            return ap
+
+        cached = _appearances.get(style)
+        if cached is None:
+            ap = AcroForm.checkboxAP(self, key, value, **kwargs)
+            if len(_appearances) < APPEARANCE_CACHE_SIZE:
+                _appearances[style] = (ap.content, dict(ap.dictionary.dict), ap._af_refstr)
+        else:
+            content, entries, refstr = cached
+            filters = [PDFStreamFilterZCompress()] if self.canv._doc.compression else None
+            ap = PDFStream(PDFDictionary(dict(entries)), content, filters=filters)
+            ap._af_refstr = refstr
+
+        self._doc_appearances[style] = ap
+        return ap
+
+
+def install_shared_appearances(c):
+    """Give canvas c a SharedAppearanceAcroForm before any widget is drawn"""
+    c._doc._catalog.AcroForm = c.AcroForm = SharedAppearanceAcroForm(c)
+    return c.AcroForm
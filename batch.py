@@ -0,0 +1,202 @@
+# batch.py - Generate many form PDFs across a process pool
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Jobs sent to a worker at a time; big enough to amortise the pickling
+# round trip, small enough to keep every core busy near the end of a run
+DEFAULT_CHUNKSIZE = 16
+
+# Chunks queued per worker ahead of the results being consumed
+CHUNKS_IN_FLIGHT = 2
+
+
+class JobResult:
+    """Outcome of one generate_many() job.
+
+    ``index`` is the job's position in the input, ``output`` its target,
+    ``pages`` the page count written and ``error`` None on success or a
+    "Type: message" string if it failed.
+    """
+    __slots__ = ('index', 'output', 'error', 'seconds', 'pages')
+
+    def __init__(self, index, output, error, seconds, pages=None):
+        self.index = index
+        self.output = output
+        self.error = error
+        self.seconds = seconds
+        self.pages = pages
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'error={self.error!r}'
+        return f"JobResult({self.index}, {self.output!r}, {status}, {self.seconds:.3f}s)"
+
+
+def _load_form(form):
+    """A form definition given as parsed JSON, raw JSON bytes or a JSON file path"""
+    if isinstance(form, (bytes, bytearray)):
+        return json.loads(form)
+    if isinstance(form, (str, os.PathLike)):
+        with open(form, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    return form
+
+
+def _run_job(index, form, output, options, quiet):
+    from jsonToPDF import ModernPDFFormGenerator
+
+    start = time.perf_counter()
+    pages = None
+    try:
+        # Renderers print progress and per-field problems; with thousands of
+        # jobs that output is noise, the job's own error is in the result
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            pages = ModernPDFFormGenerator(_load_form(form), **options).generate_pdf(output)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return JobResult(index, output, error, time.perf_counter() - start, pages)
+
+
+def _run_chunk(chunk, options, quiet):
+    return [_run_job(index, form, output, options, quiet) for index, (form, output) in chunk]
+
+
+def _chunks(jobs, chunksize):
+    chunk = []
+    for item in enumerate(jobs):
+        chunk.append(item)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_many(jobs, workers=None, chunksize=DEFAULT_CHUNKSIZE, ordered=True,
+                  quiet=True, **generator_options):
+    """Render (form, output) jobs in worker processes, yielding a JobResult each.
+
+    ``form`` is parsed form JSON, the raw JSON as bytes or the path to a
+    JSON file (the last two are cheaper to send to a worker, which parses
+    them); ``output`` is the PDF path to write.
+    ``generator_options`` are passed to every ModernPDFFormGenerator, e.g.
+    ``compact=True``. A failing job is reported in its result and the run
+    carries on.
+
+    Jobs are read lazily and only a few chunks per worker are queued at a
+    time, so ``jobs`` can be a generator over a very large input. With
+    ``ordered=False`` results come back as chunks finish. ``workers=1``
+    runs everything in this process. Scripts using a pool must call this
+    under ``if __name__ == '__main__':`` on platforms that spawn workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(jobs, max(1, chunksize))
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from _run_chunk(chunk, generator_options, quiet)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        limit = workers * CHUNKS_IN_FLIGHT
+
+        def submit_more():
+            while len(pending) < limit:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                pending.append((pool.submit(_run_chunk, chunk, generator_options, quiet), chunk))
+
+        submit_more()
+        while pending:
+            if ordered:
+                done, chunk = pending.popleft()
+            else:
+                finished, _ = wait([future for future, _ in pending], return_when=FIRST_COMPLETED)
+                done, chunk = next(item for item in pending if item[0] in finished)
+                pending.remove((done, chunk))
+            try:
+                results = done.result()
+            except Exception as e:
+                # The chunk never ran (unpicklable job, worker killed): fail its jobs only
+                error = f"{type(e).__name__}: {e}"
+                results = [JobResult(index, output, error, 0.0) for index, (_, output) in chunk]
+            submit_more()
+            yield from results
+
+
+# ---------- NDJSON bulk mode ----------
+
+def _status_line(result, line_numbers, started):
+    status = {
+        'line': line_numbers[result.index],
+        'output': result.output,
+        'ok': result.ok,
+        'pages': result.pages,
+        'seconds': round(result.seconds, 4),
+        'elapsed': round(time.perf_counter() - started, 4),
+    }
+    if not result.ok:
+        status['error'] = result.error
+    return json.dumps(status)
+
+
+def main(argv=None):
+    """Render newline-delimited form JSON, printing one NDJSON status line per record.
+
+    Usage: python jsonToPDF.py --bulk [input.ndjson|-] --output-dir DIR
+    Records are read lazily from the file or stdin, so the input can be an
+    export piped from another process. Returns 1 if any record failed.
+    """
+    parser = argparse.ArgumentParser(prog='jsonToPDF.py --bulk',
+                                     description='Render NDJSON form records to PDFs')
+    parser.add_argument('input', nargs='?', default='-', help="NDJSON file, or - for stdin")
+    parser.add_argument('--output-dir', required=True, help="directory for form-<line>.pdf files")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--unordered', action='store_true', help="report records as they finish")
+    parser.add_argument('--compact', action='store_true', help="write object streams (PDF 1.5)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    options = {'compact': True} if args.compact else {}
+
+    # Job index -> input line number; entries are dropped once reported, so
+    # this holds at most the records in flight
+    line_numbers = {}
+
+    def jobs():
+        records = ((number, line) for number, line in enumerate(source, 1) if line.strip())
+        for index, (line_number, line) in enumerate(records):
+            line_numbers[index] = line_number
+            yield line, os.path.join(args.output_dir, f'form-{line_number:07d}.pdf')
+
+    started = time.perf_counter()
+    failed = 0
+    try:
+        for result in generate_many(jobs(), workers=args.workers, chunksize=args.chunksize,
+                                    ordered=not args.unordered, **options):
+            failed += not result.ok
+            print(_status_line(result, line_numbers, started), flush=True)
+            del line_numbers[result.index]
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
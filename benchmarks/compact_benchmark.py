@@ -0,0 +1,73 @@
+# compact_benchmark.py - File size of compact (object stream) output
+#
+# Usage: python benchmarks/compact_benchmark.py [form.json] [runs]
+#
+# Renders the form with the classic xref table and in compact mode, each
+# with page streams uncompressed and deflated, then prints file size and
+# render time and checks every variant still carries the same AcroForm and
+# page content as the classic uncompressed file.
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compression_benchmark import _form_signature
+from jsonToPDF import ModernPDFFormGenerator
+
+# (label, compact, page stream compression level)
+MODES = (
+    ('classic', False, None),
+    ('classic+zlib', False, 6),
+    ('compact', True, None),
+    ('compact+zlib', True, 6),
+)
+
+
+def _render(form_data, compact, level, path, runs):
+    """Best-of-runs render time for one output mode"""
+    best = None
+    for _ in range(runs):
+        generator = ModernPDFFormGenerator(form_data, compression_level=level, compact=compact)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_pdf(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    form_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'form', 'form.json')
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with open(form_path, 'r', encoding='utf-8') as file:
+        form_data = json.load(file)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for label, compact, level in MODES:
+            path = os.path.join(tmp, f'{label}.pdf')
+            elapsed = _render(form_data, compact, level, path, runs)
+            results.append((label, path, os.path.getsize(path), elapsed))
+
+        baseline = _form_signature(results[0][1])
+        baseline_size = results[0][2]
+        print(f"{'mode':>13} {'bytes':>10} {'ratio':>7} {'ms':>8}  form")
+        failed = False
+        for label, path, size, elapsed in results:
+            same = _form_signature(path) == baseline
+            failed = failed or not same
+            print(f"{label:>13} {size:>10} {size / baseline_size:>7.2f} "
+                  f"{elapsed * 1000:>8.1f}  {'unchanged' if same else 'CHANGED'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
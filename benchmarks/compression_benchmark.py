@@ -0,0 +1,88 @@
+# compression_benchmark.py - Size/time tradeoff of page-stream compression
+#
+# Usage: python benchmarks/compression_benchmark.py [form.json] [runs]
+#
+# Renders the form uncompressed and at several zlib levels, prints file size
+# and render time for each, and checks that the compressed files still carry
+# the same AcroForm (fields, widget rects, NeedAppearances) and the same page
+# content once inflated.
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PyPDF2 import PdfReader
+
+from jsonToPDF import ModernPDFFormGenerator
+
+LEVELS = (None, 1, 6, 9)
+
+
+def _render(form_data, level, path, runs):
+    """Best-of-runs render time for one compression level"""
+    best = None
+    for _ in range(runs):
+        generator = ModernPDFFormGenerator(form_data, compression_level=level)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_pdf(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _form_signature(path):
+    """Everything Acrobat's form handling depends on, plus inflated page content"""
+    reader = PdfReader(path)
+    acro_form = reader.trailer['/Root']['/AcroForm']
+    widgets = []
+    for page_index, page in enumerate(reader.pages):
+        for annot in page.get('/Annots') or []:
+            annot = annot.get_object()
+            widgets.append((
+                page_index,
+                str(annot.get('/T')),
+                str(annot.get('/FT')),
+                int(annot.get('/Ff', 0)),
+                [round(float(value), 2) for value in annot['/Rect']],
+            ))
+    content = [page.get_contents().get_data() for page in reader.pages]
+    return bool(acro_form.get('/NeedAppearances')), widgets, content
+
+
+def main():
+    form_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'form', 'form.json')
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with open(form_path, 'r', encoding='utf-8') as file:
+        form_data = json.load(file)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_path = os.path.join(tmp, 'uncompressed.pdf')
+        results = []
+        for level in LEVELS:
+            path = baseline_path if level is None else os.path.join(tmp, f'level{level}.pdf')
+            elapsed = _render(form_data, level, path, runs)
+            results.append((level, path, os.path.getsize(path), elapsed))
+
+        baseline = _form_signature(baseline_path)
+        baseline_size = results[0][2]
+        print(f"{'level':>6} {'bytes':>10} {'ratio':>7} {'ms':>8}  form")
+        failed = False
+        for level, path, size, elapsed in results:
+            same = _form_signature(path) == baseline
+            failed = failed or not same
+            print(f"{'off' if level is None else level:>6} {size:>10} {size / baseline_size:>7.2f} "
+                  f"{elapsed * 1000:>8.1f}  {'unchanged' if same else 'CHANGED'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,12 +2,23 @@
 from reportlab.lib import colors
 import os
 
+# Library version; bump whenever layout output changes so cached layouts
+# from older code are not reused
+VERSION = '1.3.0'
+
 # Reasonable margins for clean layout
 MARGINS = {
     'x': 50,  # Reasonable margin
     'bottom': 60  # Reasonable bottom margin
 }
 
+# Page breaks inside splittable labels never leave fewer than this many
+# lines at the bottom of a page (orphans) or the top of the next (widows)
+PAGINATION = {
+    'orphan_lines': 2,
+    'widow_lines': 2
+}
+
 # Normal field dimensions
 FIELD_DIMENSIONS = {
     'width': 510,
@@ -36,6 +47,12 @@ BUSINESS_INFO = {
     'email': 'sales@summitcargotrailers.com'
 }
 
+# Box the logo is shrunk to at the left of the first-page header
+LOGO_BOX = {
+    'max_width': 96,
+    'max_height': 24
+}
+
 COLORS = {
     'primary': colors.black,
     'secondary': colors.Color(0.4, 0.4, 0.4),
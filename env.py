@@ -8,6 +8,10 @@ DEFAULT_PDF_PATH = '/Users/camerondyas/Documents/scripts/pythonScripts/JSONToPDF
 # Environment variable keys
 JSON_INPUT_PATH_KEY = 'JSON_INPUT_PATH'
 PDF_OUTPUT_PATH_KEY = 'PDF_OUTPUT_PATH'
+LAYOUT_CACHE_DIR_KEY = 'LAYOUT_CACHE_DIR'
+WRAP_CACHE_PATH_KEY = 'WRAP_CACHE_PATH'
+PDF_COMPRESSION_LEVEL_KEY = 'PDF_COMPRESSION_LEVEL'
+PDF_COMPACT_KEY = 'PDF_COMPACT'
 
 def get_json_input_path():
     """Get JSON input path from environment or return default"""
@@ -17,6 +21,29 @@ def get_pdf_output_path():
     """Get PDF output path from environment or return default"""
     return os.getenv(PDF_OUTPUT_PATH_KEY, DEFAULT_PDF_PATH)
 
+def get_layout_cache_dir():
+    """Get the on-disk layout cache directory, or None to keep it in memory only"""
+    return os.getenv(LAYOUT_CACHE_DIR_KEY) or None
+
+def get_wrap_cache_path():
+    """Get the file backing the cross-process wrap cache, or None to disable it"""
+    return os.getenv(WRAP_CACHE_PATH_KEY) or None
+
+def get_compression_level():
+    """Get the zlib level (0-9) for page streams, or None to leave them uncompressed"""
+    level = os.getenv(PDF_COMPRESSION_LEVEL_KEY)
+    if not level:
+        return None
+    try:
+        return min(max(int(level), 0), 9)
+    except ValueError:
+        print(f"Ignoring invalid {PDF_COMPRESSION_LEVEL_KEY}: {level}")
+        return None
+
+def get_compact_output():
+    """Whether to write object streams and an xref stream (PDF 1.5) instead of a classic xref table"""
+    return os.getenv(PDF_COMPACT_KEY, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
 # For direct access
 JSON_INPUT_PATH = get_json_input_path()
 PDF_OUTPUT_PATH = get_pdf_output_path()
\ No newline at end of file
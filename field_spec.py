@@ -0,0 +1,136 @@
+# field_spec.py - Normalized field representation parsed once per form
+import re
+
+from constants import FULL_WIDTH_FIELDS
+from label_parser import (HTML_H1, HTML_H3, HTML_H4, HTML_H5, HTML_P, HTML_LIST,
+                          HTML_SPLIT, parse_label)
+from utils import _strip_html_tags, _get_options
+
+# Field types that only exist for the web form
+SUBMISSION_TYPES = frozenset(('pdf_download', 'submit'))
+
+
+def normalize_field_value(value):
+    """Normalize to lowercase_with_underscores and strip non-alnum."""
+    if value is None:
+        return ""
+    normalized = str(value).lower().replace(" ", "_")
+    normalized = re.sub(r'[^a-z0-9_]', '_', normalized)
+    normalized = re.sub(r'_+', '_', normalized)
+    return normalized.strip('_')
+
+
+def options_as_key_label(options):
+    """
+    Return list[(key, label)].
+    Supports:
+      - {"option": {"key": "Label", ...}}
+      - {"options": {"key": "Label", ...}}
+      - {"key": "Label", ...}
+      - [("key","Label"), ...]
+      - [{"value":"key","label":"Label"}, ...]
+      - ["Label1","Label2", ...] -> [("label1","Label1"), ...]
+      - anything else -> [(normalized(str), str)]
+    """
+    # Case: full field spec with nested dict under "option" or "options"
+    if isinstance(options, dict):
+        nested = None
+        if "option" in options and isinstance(options["option"], dict):
+            nested = options["option"]
+        elif "options" in options and isinstance(options["options"], dict):
+            nested = options["options"]
+
+        if nested is not None:
+            return [(str(k), str(v)) for k, v in nested.items()]
+
+        # Plain mapping of key->label
+        if all(isinstance(k, (str, int)) for k in options.keys()):
+            keys = list(options.keys())
+            if not {"name", "label", "email_label", "type"} & set(keys):
+                return [(str(k), str(v)) for k, v in options.items()]
+
+    # List/tuple style
+    if isinstance(options, (list, tuple)):
+        out = []
+        for item in options:
+            if isinstance(item, tuple) and len(item) == 2:
+                k, v = item
+                out.append((str(k), str(v)))
+            elif isinstance(item, dict):
+                if "value" in item and "label" in item:
+                    out.append((str(item["value"]), str(item["label"])))
+                else:
+                    for k, v in item.items():
+                        out.append((str(k), str(v)))
+            else:
+                s = str(item)
+                out.append((normalize_field_value(s), s))
+        return out
+
+    # Fallback: single string or anything else
+    s = str(options)
+    return [(normalize_field_value(s), s)]
+
+
+class FieldSpec:
+    """One form field with everything layout needs already normalized.
+
+    ``options`` holds (key, label) pairs with matching ``option_slugs`` for
+    widget names; ``choices`` holds the (value, label) pairs used by radio
+    and select fields. ``checked_text`` is the long text of a single
+    acknowledgement checkbox, if any.
+    """
+    __slots__ = ('type', 'name', 'label', 'clean_label', 'html_flags', 'options',
+                 'option_slugs', 'choices', 'checked_text', 'full_width')
+
+    def __init__(self, field_type, name, label, options=(), option_slugs=(), choices=(),
+                 checked_text=None, full_width=False):
+        self.type = field_type
+        self.name = name
+        self.label = label
+        self.clean_label = _strip_html_tags(label)
+        label_lower = label.lower()
+        self.html_flags = parse_label(label).flags
+        self.options = options
+        self.option_slugs = option_slugs
+        self.choices = choices
+        self.checked_text = checked_text
+
+        # Women Only label is detected by content and breaks out of groups too
+        is_women_only_label = (field_type == 'label' and
+                               'women only' in label_lower and
+                               'are you' in label_lower)
+        self.full_width = full_width or is_women_only_label
+
+    @classmethod
+    def from_dict(cls, field):
+        raw_options = field.get('option', {})
+        options = tuple(options_as_key_label(raw_options))
+        checked_text = None
+        if isinstance(raw_options, dict) and 'checked' in raw_options:
+            checked_text = raw_options['checked']
+
+        name = field.get('name', '')
+        return cls(
+            field.get('type', '').lower().strip(),
+            name,
+            field.get('label', '') or '',
+            options=options,
+            option_slugs=tuple(normalize_field_value(key) for key, _ in options),
+            choices=tuple(_get_options(raw_options)),
+            checked_text=checked_text,
+            full_width=name in FULL_WIDTH_FIELDS
+        )
+
+    def has_html(self, flag):
+        return bool(self.html_flags & flag)
+
+    def with_label(self, label):
+        """Copy of this field drawn with a different label"""
+        return FieldSpec(self.type, self.name, label, self.options, self.option_slugs,
+                         self.choices, self.checked_text, self.full_width)
+
+
+def parse_fields(raw_fields):
+    """Parse raw JSON field dicts into FieldSpecs"""
+    return [FieldSpec.from_dict(field) for field in raw_fields]
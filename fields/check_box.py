@@ -3,7 +3,8 @@
 # FIXED: field names = f"{field_name}_{key}"
 # FIXED: tries to set export value to the full name (fallback-safe)
 
-from utils import _strip_html_tags, wrap_text, create_acrobat_compatible_field, _check_page_break
+from utils import _strip_html_tags, wrap_text, create_acrobat_compatible_field
+from text_metrics import string_width
 
 # ===== CheckBox visual tuning (points) =====
 CHECKBOX_BOX_SIZE = 12          # square size
@@ -13,36 +14,35 @@ CHECKBOX_VPAD = 0               # vertical breathing room inside a row (was 2 /
 CHECKBOX_BASELINE_NUDGE = -9    # tiny nudge for the first text line (your -10 was extreme)
 
 # Compact rules for multi-option lists in two-column groups
-# Keep rows as short as content allows and ignore any tall group_row_height.
+# Keep rows as short as content allows and ignore any tall group row_height.
 MULTI_MIN_ROW = 0               # force minimum row to 0 for multi-option lists
 
 
 class CheckBox:
-    def __init__(self, generator, canvas):
+    def __init__(self, generator):
         self.generator = generator
-        self.canvas = canvas
         self.colors = generator.colors
         self.margin_x = generator.margin_x
         self.field_width = generator.field_width
 
-    def draw(self, field_name, label, options):
-        c = self.canvas
+    def draw(self, c, field):
         current_font = c._fontname
         current_size = c._fontsize
         current_color = c._fillColorObj
-
-        self.current_options = options
+        field_name = field.name
+        label = field.label
 
         # Only apply extra spacing when we're NOT inside a layout group
         if self.generator.current_group is None:
-            spacing = self._calculate_dynamic_spacing(field_name, label, options)
+            spacing = self._calculate_dynamic_spacing(field)
             self.generator.current_y -= spacing
 
-        field_x, field_width, field_y = self._get_field_position()
+        field_x, field_width, field_y = self.generator.group_field.get_field_position()
         starting_y = field_y
 
-        # Parse options as (key, label)
-        options_list = self._options_as_key_label(options)
+        # Options were normalized once by FieldSpec: (widget name suffix, label)
+        options_list = [(slug, option_label) for slug, (_, option_label)
+                        in zip(field.option_slugs, field.options)]
         print(f"[CheckBox] options_list(normalized)={options_list}")
 
         if len(options_list) == 1:
@@ -53,74 +53,11 @@ class CheckBox:
         c.setFont(current_font, current_size)
         c.setFillColor(current_color)
 
-    # ---------- option normalization ----------
-
-    def _options_as_key_label(self, options):
-        """
-        Return list[(key, label)].
-        Supports:
-          - {"option": {"key": "Label", ...}}
-          - {"options": {"key": "Label", ...}}
-          - {"key": "Label", ...}
-          - [("key","Label"), ...]
-          - [{"value":"key","label":"Label"}, ...]
-          - ["Label1","Label2", ...] -> [("label1","Label1"), ...]
-          - anything else -> [(normalized(str), str)]
-        """
-        # Case: full field spec with nested dict under "option" or "options"
-        if isinstance(options, dict):
-            nested = None
-            if "option" in options and isinstance(options["option"], dict):
-                nested = options["option"]
-            elif "options" in options and isinstance(options["options"], dict):
-                nested = options["options"]
-
-            if nested is not None:
-                return [(str(k), str(v)) for k, v in nested.items()]
-
-            # Plain mapping of key->label
-            if all(isinstance(k, (str, int)) for k in options.keys()):
-                keys = list(options.keys())
-                if not {"name", "label", "email_label", "type"} & set(keys):
-                    return [(str(k), str(v)) for k, v in options.items()]
-
-        # List/tuple style
-        if isinstance(options, (list, tuple)):
-            out = []
-            for item in options:
-                if isinstance(item, tuple) and len(item) == 2:
-                    k, v = item
-                    out.append((str(k), str(v)))
-                elif isinstance(item, dict):
-                    if "value" in item and "label" in item:
-                        out.append((str(item["value"]), str(item["label"])))
-                    else:
-                        for k, v in item.items():
-                            out.append((str(k), str(v)))
-                else:
-                    s = str(item)
-                    out.append((self._normalize_field_value(s), s))
-            return out
-
-        # Fallback: single string or anything else
-        s = str(options)
-        return [(self._normalize_field_value(s), s)]
-
     # ---------- helpers ----------
 
-    def _normalize_field_value(self, value):
-        """Normalize to lowercase_with_underscores and strip non-alnum."""
-        if value is None:
-            return ""
-        import re
-        normalized = str(value).lower().replace(" ", "_")
-        normalized = re.sub(r'[^a-z0-9_]', '_', normalized)
-        normalized = re.sub(r'_+', '_', normalized)
-        return normalized.strip('_')
-
-    def _calculate_dynamic_spacing(self, field_name, label, options):
+    def _calculate_dynamic_spacing(self, field):
         base_spacing = 5
-        checkbox_text = self._get_checkbox_text(label, options)
+        checkbox_text = self._get_checkbox_text(field)
         if len(checkbox_text) > 200:
             text_spacing = 10
         elif len(checkbox_text) > 100:
@@ -129,14 +66,13 @@ class CheckBox:
             text_spacing = 0
         return min(base_spacing + text_spacing, 60)
 
-    def _get_checkbox_text(self, label, options):
-        checkbox_text = label or ""
+    def _get_checkbox_text(self, field):
+        checkbox_text = field.label or ""
         if not checkbox_text or not checkbox_text.strip():
-            if options and isinstance(options, dict):
-                if 'checked' in options:
-                    checkbox_text = options['checked']
-                elif len(options) == 1:
-                    checkbox_text = list(options.values())[0]
+            if field.checked_text is not None:
+                checkbox_text = field.checked_text
+            elif len(field.options) == 1:
+                checkbox_text = field.options[0][1]
         return _strip_html_tags(checkbox_text or "")
 
     def _create_checkbox_field(self, c, *, name, tooltip, x, y, size, checked=False, fieldFlags=0):
@@ -202,8 +138,7 @@ class CheckBox:
 
         in_two_col = (
             self.generator.current_group == 'two_columns' and
-            self.generator.group_columns == 2 and
-            self.generator.column_widths is not None
+            self.generator.group_grid.columns == 2
         )
 
         if in_two_col:
@@ -216,7 +151,7 @@ class CheckBox:
 
             # Row height is the max of square size and wrapped text height (honor group min height too)
             content_row_h = max(checkbox_size, text_block_h) + v_pad
-            enforced_min = getattr(self.generator, "group_row_height", 0) or 0
+            enforced_min = self.generator.group_grid.row_height
             row_h = max(content_row_h, enforced_min)
 
             # Vertically center the square and the text block within the row
@@ -224,8 +159,7 @@ class CheckBox:
             first_line_y = field_y - (row_h - text_block_h) / 2 + baseline_nudge
 
             # Field name
-            normalized_value = self._normalize_field_value(value_key)
-            checkbox_name = f"{field_name}_{normalized_value}"
+            checkbox_name = f"{field_name}_{value_key}"
 
             # Draw form field
             self._create_checkbox_field(
@@ -243,35 +177,26 @@ class CheckBox:
             c.setFont(font_name, font_size)
             c.setFillColor(color)
             text_x = field_x + checkbox_size + gap
-            y = first_line_y
-            for line in lines:
-                c.drawString(text_x, y, line)
-                y -= line_height
+            c.drawTextLines(text_x, first_line_y, lines, line_height)
 
             # Tell the group how tall this row is
             final_y = field_y - row_h
-            self._handle_group_positioning(field_x, field_width, final_y, field_y)
+            self.generator.group_field.add_field_to_group(final_y, field_y)
 
             # Only after the row is complete (both columns) should we move current_y
-            idx = len(self.generator.group_fields)
-            if idx % self.generator.group_columns == 0:
-                self.generator.current_y = final_y - getattr(self.generator, 'group_row_gap', 6)  # tighter default
+            grid = self.generator.group_grid
+            if grid.column == 0:
+                self.generator.current_y = final_y - grid.row_gap
             return
 
         # ----- non-group branch -----
-        lines, total_text_height = wrap_text(
+        lines, _ = wrap_text(
             c, checkbox_text,
             self.generator.page_width - (field_x + checkbox_size + gap) - self.generator.margin_x,
             font_name, font_size
         )
-        needed_height = max(checkbox_size, total_text_height) + 20
-        if (field_y - needed_height) < self.generator.margin_bottom:
-            if _check_page_break(self.generator, c, needed_height + 20):
-                self.generator.page_manager.initialize_page(c)
-                field_x, field_width, field_y = self._get_field_position()
-
-        normalized_value = self._normalize_field_value(value_key)
-        checkbox_name = f"{field_name}_{normalized_value}"
+
+        checkbox_name = f"{field_name}_{value_key}"
         box_y = field_y - checkbox_size + 2
 
         self._create_checkbox_field(
@@ -288,34 +213,30 @@ class CheckBox:
         c.setFont(font_name, font_size)
         c.setFillColor(color)
         text_x = field_x + checkbox_size + gap
-        text_y = field_y - 2
-        for line in lines:
-            c.drawString(text_x, text_y, line)
-            text_y -= font_size + max(1, line_gap)
+        line_height = font_size + max(1, line_gap)
+        c.drawTextLines(text_x, field_y - 2, lines, line_height)
+        text_y = field_y - 2 - line_height * len(lines)
 
         after_spacing = 8  # fixed, tighter
         final_y = min(box_y, text_y) - after_spacing
         self.generator.current_y = final_y
 
         if self.generator.current_group is not None:
-            self.generator.group_fields.append({'y': final_y, 'name': field_name})
+            self.generator.group_field.add_field_to_group(final_y)
 
     def _calculate_optimal_spacing(self, options_list):
-        from reportlab.pdfbase.pdfmetrics import stringWidth
         checkbox_size = CHECKBOX_BOX_SIZE
         padding = CHECKBOX_GAP
         
-        if self.generator.current_group == 'two_columns' and self.generator.column_widths:
-            group_index = len(self.generator.group_fields)
-            column_index = group_index % self.generator.group_columns
-            available_width = self.generator.column_widths[column_index]
+        if self.generator.current_group == 'two_columns':
+            _, available_width = self.generator.group_grid.cell()
         else:
             available_width = self.field_width
         
         total_width_needed = 0
         for _, option_label in options_list:
             clean_label = _strip_html_tags(option_label)
-            label_width = stringWidth(clean_label, "Helvetica", 9)
+            label_width = string_width(clean_label, "Helvetica", 9)
             item_width = checkbox_size + padding + label_width + 8
             total_width_needed += item_width
         
@@ -335,8 +256,7 @@ class CheckBox:
 
         in_two_col = (
             self.generator.current_group == 'two_columns' and
-            self.generator.group_columns == 2 and
-            self.generator.column_widths is not None
+            self.generator.group_grid.columns == 2
         )
 
         checkbox_size = CHECKBOX_BOX_SIZE
@@ -351,13 +271,13 @@ class CheckBox:
             c.setFont("Helvetica", 9)
             c.setFillColor(self.colors['primary'])
 
-            # Compact: ignore any tall group_row_height for multi-option lines
+            # Compact: ignore any tall group row_height for multi-option lines
             enforced_min = MULTI_MIN_ROW
 
             y_top = self.generator.current_y
             y_cursor = y_top
 
-            for value_key, option_label in options_list:
+            for index, (value_key, option_label) in enumerate(options_list):
                 clean_label = _strip_html_tags(option_label)
 
                 lines, _ = wrap_text(c, clean_label, usable_text_w, "Helvetica", 9)
@@ -367,21 +287,19 @@ class CheckBox:
                 content_row_h = max(checkbox_size, text_block_h) + v_pad
                 row_h = max(content_row_h, enforced_min)
 
-                # Page break if necessary
-                if (y_cursor - row_h) < self.generator.margin_bottom:
-                    if _check_page_break(self.generator, c, row_h + 20):
-                        self.generator.page_manager.initialize_page(c)
+                # Rows are kept whole; the paginator may move one to a new page
+                if index > 0:
+                    row_y = self.generator.paginator.row_break(c, y_cursor, row_h)
+                    if row_y != y_cursor:
                         c.setFont("Helvetica", 9)
                         c.setFillColor(self.colors['primary'])
-                        y_top = self.generator.current_y
-                        y_cursor = y_top
+                        field_y = y_top = y_cursor = row_y
 
                 # Center square + text inside the item row
                 box_y = y_cursor - (row_h - checkbox_size) / 2 - checkbox_size
                 first_line_y = y_cursor - (row_h - text_block_h) / 2 + baseline_nudge
 
-                normalized_value = self._normalize_field_value(value_key)
-                checkbox_name = f"{field_name}_{normalized_value}"
+                checkbox_name = f"{field_name}_{value_key}"
 
                 self._create_checkbox_field(
                     c,
@@ -395,10 +313,7 @@ class CheckBox:
                 )
 
                 text_x = field_x + checkbox_size + gap
-                y = first_line_y
-                for line in lines:
-                    c.drawString(text_x, y, line)
-                    y -= line_height
+                c.drawTextLines(text_x, first_line_y, lines, line_height)
 
                 y_cursor -= row_h
 
@@ -407,11 +322,11 @@ class CheckBox:
             final_field_y = field_y - block_h
 
             if self.generator.current_group is not None:
-                self._handle_group_positioning(field_x, field_width, final_field_y, field_y)
-                # End-of-row step uses a smaller default gap (6)
-                idx = len(self.generator.group_fields)
-                if idx % self.generator.group_columns == 0:
-                    self.generator.current_y = final_field_y - getattr(self.generator, 'group_row_gap', 6)
+                self.generator.group_field.add_field_to_group(final_field_y, field_y)
+                # A finished row continues below this field
+                grid = self.generator.group_grid
+                if grid.column == 0:
+                    self.generator.current_y = final_field_y - grid.row_gap
             else:
                 self.generator.current_y = y_cursor - 3  # slightly tighter
             return
@@ -427,11 +342,10 @@ class CheckBox:
         available_width = field_width
         start_x = field_x
 
-        from reportlab.pdfbase.pdfmetrics import stringWidth
         item_widths = []
         for _, option_label in options_list:
             clean_label = _strip_html_tags(option_label)
-            label_width = stringWidth(clean_label, "Helvetica", 9)
+            label_width = string_width(clean_label, "Helvetica", 9)
             item_width = checkbox_size + gap + label_width + 12
             item_widths.append(item_width)
 
@@ -449,18 +363,14 @@ class CheckBox:
                 items_in_current_row = 0
                 current_row_width = 0
 
-            checkbox_y_position = self.generator.current_y - checkbox_size + 2
-            if checkbox_y_position < self.generator.margin_bottom:
-                if _check_page_break(self.generator, c, checkbox_size + 20):
-                    self.generator.page_manager.initialize_page(c)
-                    current_x = start_x
-                    items_in_current_row = 0
-                    current_row_width = 0
+                # The paginator may move the new row to the next page
+                row_y = self.generator.current_y
+                if self.generator.paginator.row_break(c, row_y, checkbox_size - 2) != row_y:
                     c.setFont("Helvetica", 9)
                     c.setFillColor(self.colors['primary'])
+                    starting_y = self.generator.current_y
 
-            normalized_value = self._normalize_field_value(value_key)
-            checkbox_name = f"{field_name}_{normalized_value}"
+            checkbox_name = f"{field_name}_{value_key}"
             final_checkbox_y = self.generator.current_y - checkbox_size + 2
 
             self._create_checkbox_field(
@@ -484,49 +394,8 @@ class CheckBox:
 
         final_field_y = self.generator.current_y - checkbox_size - 8  # tighter
         if self.generator.current_group is not None:
-            self._handle_group_positioning(field_x, field_width, final_field_y, starting_y)
+            self.generator.group_field.add_field_to_group(final_field_y, starting_y, row_gap=self.generator.group_grid.row_gap)
         else:
             self.generator.current_y = final_field_y - 3
 
     # ---------- layout helpers ----------
-
-    def _get_field_position(self):
-        field_x = self.margin_x
-        field_width = self.field_width
-        field_y = self.generator.current_y
-
-        if self.generator.current_group is not None:
-            group_index = len(self.generator.group_fields)
-            column_index = group_index % self.generator.group_columns
-
-            field_x = self.margin_x
-            if column_index > 0:
-                field_x += sum(self.generator.column_widths[:column_index])
-                field_x += self.generator.group_spacing * column_index
-
-            field_width = self.generator.column_widths[column_index]
-
-            if column_index > 0 and self.generator.group_fields:
-                row_index = group_index // self.generator.group_columns
-                first_in_row_index = row_index * self.generator.group_columns
-                if first_in_row_index < len(self.generator.group_fields):
-                    first_field = self.generator.group_fields[first_in_row_index]
-                    field_y = first_field.get('start_y', first_field.get('y', field_y))
-
-        return field_x, field_width, field_y
-
-    def _handle_group_positioning(self, field_x, field_width, final_y, start_y):
-        self.generator.group_fields.append({
-            'name': 'checkbox',
-            'x': field_x,
-            'y': final_y,
-            'start_y': start_y,
-            'width': field_width
-        })
-
-        # End-of-row gap uses group_row_gap when available, else a tighter default of 6
-        if len(self.generator.group_fields) % self.generator.group_columns == 0:
-            row_start = len(self.generator.group_fields) - self.generator.group_columns
-            row_fields = self.generator.group_fields[row_start:]
-            min_y = min(f.get('y', self.generator.current_y) for f in row_fields)
-            self.generator.current_y = min_y - getattr(self.generator, 'group_row_gap', 6)
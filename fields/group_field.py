@@ -1,30 +1,139 @@
 # fields/group_field.py - SIMPLIFIED AND FIXED
 
+# Simplified group types - only track functional layout groups
+LAYOUT_GROUPS = {
+    'two_columns': {'columns': 2, 'widths': [0.48, 0.48], 'spacing': 10},  # Reduced from 20
+    'four_columns': {'columns': 4, 'widths': [0.22, 0.22, 0.22, 0.22], 'spacing': 8},  # Reduced from 15
+    'name_details': {'columns': 2, 'widths': [0.6, 0.4], 'spacing': 10},  # Reduced from 15
+    'address_details': {'columns': 3, 'widths': [0.4, 0.3, 0.3], 'spacing': 8},  # Reduced from 12
+    'patient_contact': {'columns': 2, 'widths': [0.5, 0.5], 'spacing': 10},  # Reduced from 15
+    'phone_details': {'columns': 3, 'widths': [0.33, 0.33, 0.33], 'spacing': 8},  # Reduced from 10
+}
+
+# Container groups that we ignore for layout purposes
+CONTAINER_GROUPS = frozenset({
+    'form_container', 'form_content_container', 'primary_insurance', 
+    'secondary_insurance', 'permanent', 'deciduous', 'top_row', 
+    'bottom_row', 'tooth_container', 'indent_x1', 'substance_details', 
+    'pharmacy_information'
+})
+
+
+# Row spacing for text fields stacked under the previous row
+STACKED_ROW_SPACING = 35
+
+# Gap after a finished group
+GROUP_END_GAP = 15
+
+
+class GroupGrid:
+    """Placement state for the active layout group.
+
+    Column x-offsets and widths are computed once when the group starts.
+    Rows are tracked by their running minimum y, so placing a field costs
+    the same whether the group has four cells or four hundred.
+    """
+    def __init__(self, name, config, margin_x, field_width, start_y):
+        self.name = name
+        self.columns = config['columns']
+        self.spacing = config['spacing']
+
+        total_spacing = self.spacing * (self.columns - 1) if self.columns > 1 else 0
+        available_width = field_width - total_spacing
+        self.column_widths = [w * available_width for w in config['widths']]
+        self.column_x = []
+        for column_index in range(self.columns):
+            field_x = margin_x
+            if column_index > 0:
+                field_x += sum(self.column_widths[:column_index])
+                field_x += self.spacing * column_index
+            self.column_x.append(field_x)
+
+        # Consistent vertical rhythm used by checkbox rows
+        # works well with 12px boxes + 9/10pt labels
+        self.row_height = 22
+        self.row_gap = 10  # gap added after a completed row
+
+        self.restart(start_y)
+
+    def restart(self, start_y):
+        """Forget placed fields, e.g. when the group continues on a new page"""
+        self.start_y = start_y
+        self.count = 0
+        self.rows = []              # (first start_y, min y) per completed row
+        self.min_y = None
+        self._row_start_y = None
+        self._row_min_y = None
+
+    def continue_row(self, start_y):
+        """Carry the field being placed onto a new page in the same column.
+
+        Rows above it stay on the previous page; later fields in its row
+        line up with start_y.
+        """
+        column = self.column
+        self.restart(start_y)
+        self.count = column
+        if column > 0:
+            self._row_start_y = start_y
+            self._row_min_y = start_y
+
+    def snapshot(self):
+        """Placement state, for undoing a tentatively placed field"""
+        # restart() swaps in a new rows list, so keeping a reference to
+        # the current one is enough to undo it
+        return (self.start_y, self.count, self.rows, len(self.rows), self.min_y,
+                self._row_start_y, self._row_min_y)
+
+    def restore(self, state):
+        (self.start_y, self.count, self.rows, row_count, self.min_y,
+         self._row_start_y, self._row_min_y) = state
+        del self.rows[row_count:]
+
+    @property
+    def column(self):
+        return self.count % self.columns
+
+    def cell(self):
+        """x and width of the next field"""
+        column = self.count % self.columns
+        return self.column_x[column], self.column_widths[column]
+
+    def row_start_y(self):
+        """Start y of the first field in the current row, or None"""
+        return self._row_start_y
+
+    def stacked_y(self):
+        """Top of the next row, just under the previous row's lowest field"""
+        if self.count < self.columns:
+            return self.start_y
+        return self.rows[-1][1] - STACKED_ROW_SPACING
+
+    def add(self, final_y, start_y=None):
+        """Record a placed field; returns the row's lowest y if it completed one"""
+        if self.count % self.columns == 0:
+            self._row_start_y = final_y if start_y is None else start_y
+            self._row_min_y = final_y
+        elif final_y < self._row_min_y:
+            self._row_min_y = final_y
+        if self.min_y is None or final_y < self.min_y:
+            self.min_y = final_y
+
+        self.count += 1
+        if self.count % self.columns == 0:
+            self.rows.append((self._row_start_y, self._row_min_y))
+            return self._row_min_y
+        return None
+
+
 class GroupField:
-    def __init__(self, generator, canvas):
+    def __init__(self, generator):
         self.generator = generator
-        self.canvas = canvas
         self.margin_x = generator.margin_x
         self.field_width = generator.field_width
         self.colors = generator.colors
-        
-        # Simplified group types - only track functional layout groups
-        self.layout_groups = {
-            'two_columns': {'columns': 2, 'widths': [0.48, 0.48], 'spacing': 10},  # Reduced from 20
-            'four_columns': {'columns': 4, 'widths': [0.22, 0.22, 0.22, 0.22], 'spacing': 8},  # Reduced from 15
-            'name_details': {'columns': 2, 'widths': [0.6, 0.4], 'spacing': 10},  # Reduced from 15
-            'address_details': {'columns': 3, 'widths': [0.4, 0.3, 0.3], 'spacing': 8},  # Reduced from 12
-            'patient_contact': {'columns': 2, 'widths': [0.5, 0.5], 'spacing': 10},  # Reduced from 15
-            'phone_details': {'columns': 3, 'widths': [0.33, 0.33, 0.33], 'spacing': 8},  # Reduced from 10
-        }
-        
-        # Container groups that we ignore for layout purposes
-        self.container_groups = {
-            'form_container', 'form_content_container', 'primary_insurance', 
-            'secondary_insurance', 'permanent', 'deciduous', 'top_row', 
-            'bottom_row', 'tooth_container', 'indent_x1', 'substance_details', 
-            'pharmacy_information'
-        }
+        self.layout_groups = LAYOUT_GROUPS
+        self.container_groups = CONTAINER_GROUPS
 
     def start_group(self, group_name):
         """Simplified group start - only handle layout groups"""
@@ -44,85 +153,56 @@ class GroupField:
         
     def _initialize_group(self, group_name):
         self.generator.current_group = group_name
-        self.generator.group_fields = []
-        self.generator.group_start_y = self.generator.current_y
-
-        config = self.layout_groups[group_name]
-        columns = config['columns']
-        widths = config['widths']
-        spacing = config['spacing']
-
-        total_spacing = spacing * (columns - 1) if columns > 1 else 0
-        available_width = self.field_width - total_spacing
-
-        self.generator.column_widths = [w * available_width for w in widths]
-        self.generator.group_spacing = spacing
-        self.generator.group_columns = columns
-
-        # NEW: consistent vertical rhythm used by checkbox rows
-        # works well with 12px boxes + 9/10pt labels
-        self.generator.group_row_height = 22
-        self.generator.group_row_gap = 10  # gap added after a completed row
+        self.generator.group_grid = GroupGrid(
+            group_name, self.layout_groups[group_name],
+            self.margin_x, self.field_width, self.generator.current_y
+        )
 
     def end_group(self):
         """End the current group and align fields properly"""
         if self.generator.current_group is None:
             return
         
-        # Calculate the final Y position based on all fields in the group
-        if self.generator.group_fields:
-            # Find the lowest Y position among all fields
-            min_y = min(field.get('y', self.generator.current_y) for field in self.generator.group_fields)
-            # Add some spacing after the group
-            self.generator.current_y = min_y - 15
+        # Continue below the lowest field in the group
+        grid = self.generator.group_grid
+        if grid.min_y is not None:
+            self.generator.current_y = grid.min_y - GROUP_END_GAP
         
         # Reset group state
         self.generator.current_group = None
-        self.generator.group_fields = []
-        self.generator.column_widths = None
-        self.generator.group_spacing = None
-        self.generator.group_columns = None
-        self.generator.group_start_y = None
+        self.generator.group_grid = None
+
+    def get_field_position(self):
+        """Position for the next field in flow: later columns line up with
+        the top of the first field in their row"""
+        if self.generator.current_group is None:
+            return self.margin_x, self.field_width, self.generator.current_y
+
+        grid = self.generator.group_grid
+        field_x, field_width = grid.cell()
+        field_y = self.generator.current_y
+        if grid.column > 0:
+            field_y = grid.row_start_y()
+        return field_x, field_width, field_y
 
     def get_field_position_in_group(self):
         """Get the position for the next field in the current group"""
         if self.generator.current_group is None:
             return self.margin_x, self.field_width, self.generator.current_y
         
-        group_index = len(self.generator.group_fields)
-        column_index = group_index % self.generator.group_columns
-        row_index = group_index // self.generator.group_columns
-        
-        # Calculate X position
-        field_x = self.margin_x
-        if column_index > 0:
-            field_x += sum(self.generator.column_widths[:column_index])
-            field_x += self.generator.group_spacing * column_index
-        
-        field_width = self.generator.column_widths[column_index]
-        
-        # Calculate Y position - use row-based positioning
-        field_y = self.generator.group_start_y
-        if row_index > 0:
-            # For subsequent rows, look at the previous row's minimum Y
-            prev_row_start = (row_index - 1) * self.generator.group_columns
-            prev_row_end = min(prev_row_start + self.generator.group_columns, len(self.generator.group_fields))
-            if prev_row_end > prev_row_start:
-                prev_row_fields = self.generator.group_fields[prev_row_start:prev_row_end]
-                prev_row_min_y = min(f.get('y', field_y) for f in prev_row_fields)
-                field_y = prev_row_min_y - 35  # Row spacing
-        
-        return field_x, field_width, field_y
+        grid = self.generator.group_grid
+        field_x, field_width = grid.cell()
+        return field_x, field_width, grid.stacked_y()
+
+    def add_field_to_group(self, final_y, start_y=None, row_gap=None):
+        """Add a field to the current group tracking.
 
-    def add_field_to_group(self, field_name, final_y, start_y=None, field_x=None, field_width=None):
-        """Add a field to the current group tracking"""
+        With ``row_gap``, finishing a row moves current_y that far below the
+        row's lowest field.
+        """
         if self.generator.current_group is None:
             return
-            
-        self.generator.group_fields.append({
-            'name': field_name,
-            'y': final_y,
-            'start_y': start_y or final_y,
-            'x': field_x or self.margin_x,
-            'width': field_width or self.field_width
-        })
\ No newline at end of file
+
+        row_min_y = self.generator.group_grid.add(final_y, start_y)
+        if row_min_y is not None and row_gap is not None:
+            self.generator.current_y = row_min_y - row_gap
@@ -1,23 +1,24 @@
 # fields/radio_button.py - FIXED: Color issue resolved
-from utils import _get_options, _check_page_break, draw_wrapped_text, calculate_wrapped_text_height
+from utils import draw_wrapped_text, calculate_wrapped_text_height
 from reportlab.lib import colors  # ADD THIS IMPORT
+from text_metrics import string_width
 
 class RadioButton:
-    def __init__(self, generator, canvas):
+    def __init__(self, generator):
         self.generator = generator
-        self.canvas = canvas
         self.colors = generator.colors
         self.margin_x = generator.margin_x
         self.field_width = generator.field_width
 
-    def draw(self, field_name, label, options):
-        c = self.canvas
+    def draw(self, c, field):
+        field_name = field.name
+        label = field.label
         current_font = c._fontname
         current_size = c._fontsize
         current_color = c._fillColorObj
 
         # Calculate field positioning
-        field_x, field_width, field_y = self._get_field_position()
+        field_x, field_width, field_y = self.generator.group_field.get_field_position()
         starting_y = field_y
         
         # Draw label with text wrapping using actual field width
@@ -34,7 +35,7 @@ class RadioButton:
             field_y = final_label_y + 7
 
         # Get options and ensure proper capitalization
-        options_list = _get_options(options)
+        options_list = list(field.choices)
         if not options_list:
             options_list = [('Yes', 'Yes'), ('No', 'No')]
 
@@ -48,10 +49,14 @@ class RadioButton:
             options_list.append(('Not_Selected', 'Not Selected'))
 
         # Draw radio buttons
+        page = c.getPageNumber()
         final_y = self._draw_radio_buttons_clean(c, field_name, options_list, field_x, field_y, field_width)
+        if c.getPageNumber() != page:
+            # The options continued on a new page; the field's row starts there
+            starting_y = self.generator.page_top_y
 
         if self.generator.current_group is not None:
-            self._handle_group_positioning(field_x, field_width, final_y, starting_y)
+            self.generator.group_field.add_field_to_group(final_y, starting_y, row_gap=8)
         else:
             self.generator.current_y = final_y - 8
 
@@ -72,12 +77,18 @@ class RadioButton:
         current_row_y = field_y
         
         for i, (value, option_label) in enumerate(options_list):
-            option_text_width = c.stringWidth(option_label, "Helvetica", 9)
+            option_text_width = string_width(option_label, "Helvetica", 9)
             option_width = 18 + option_text_width + 8
             
             if x_offset > 0 and x_offset + option_width > max_width:
                 current_row_y -= 25
                 x_offset = 0
+
+                # The paginator may move the new row to the next page
+                row_y = self.generator.paginator.row_break(c, current_row_y, 20)
+                if row_y != current_row_y:
+                    c.setFont("Helvetica", 9)
+                    current_row_y = row_y
             
             radio_x = field_x + x_offset
             radio_y = current_row_y - 15
@@ -115,49 +126,7 @@ class RadioButton:
         c.setFont("Helvetica", 9)
         total_width = 0
         for value, option_label in options_list:
-            option_width = 18 + c.stringWidth(option_label, "Helvetica", 9) + 25
+            option_width = 18 + string_width(option_label, "Helvetica", 9) + 25
             total_width += option_width
         
         return total_width <= (field_width * 0.9)
-
-    def _get_field_position(self):
-        """Calculate position for field within group or regular flow"""
-        field_x = self.margin_x
-        field_width = self.field_width
-        field_y = self.generator.current_y
-
-        if self.generator.current_group is not None:
-            group_index = len(self.generator.group_fields)
-            column_index = group_index % self.generator.group_columns
-            
-            field_x = self.margin_x
-            if column_index > 0:
-                field_x += sum(self.generator.column_widths[:column_index])
-                field_x += self.generator.group_spacing * column_index
-            
-            field_width = self.generator.column_widths[column_index]
-            
-            if column_index > 0 and self.generator.group_fields:
-                row_index = group_index // self.generator.group_columns
-                first_in_row_index = row_index * self.generator.group_columns
-                if first_in_row_index < len(self.generator.group_fields):
-                    first_field = self.generator.group_fields[first_in_row_index]
-                    field_y = first_field.get('start_y', first_field.get('y', field_y))
-
-        return field_x, field_width, field_y
-
-    def _handle_group_positioning(self, field_x, field_width, final_y, start_y):
-        """Handle positioning when field is in a group"""
-        self.generator.group_fields.append({
-            'name': 'radio_button',
-            'x': field_x,
-            'y': final_y,
-            'start_y': start_y,
-            'width': field_width
-        })
-
-        if len(self.generator.group_fields) % self.generator.group_columns == 0:
-            row_start = len(self.generator.group_fields) - self.generator.group_columns
-            row_fields = self.generator.group_fields[row_start:]
-            min_y = min(f.get('y', self.generator.current_y) for f in row_fields)
-            self.generator.current_y = min_y - 8
\ No newline at end of file
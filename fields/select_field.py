@@ -1,17 +1,17 @@
 # fields/select_field.py - WITH TEXT WRAPPING
-from utils import _get_options, _check_page_break, draw_wrapped_text, calculate_wrapped_text_height, create_acrobat_compatible_field
+from utils import draw_wrapped_text, calculate_wrapped_text_height, create_acrobat_compatible_field
 
 class SelectField:
-    def __init__(self, generator, canvas):
+    def __init__(self, generator):
         self.generator = generator
-        self.canvas = canvas
         self.colors = generator.colors
         self.margin_x = generator.margin_x
         self.field_width = generator.field_width
         self.field_height = generator.field_height
 
-    def draw(self, field_name, label, options):
-        c = self.canvas
+    def draw(self, c, field):
+        field_name = field.name
+        label = field.label
         current_font = c._fontname
         current_size = c._fontsize
         current_color = c._fillColorObj
@@ -19,7 +19,7 @@ class SelectField:
         self.generator.current_y -= 5  # Add this line
 
         # Calculate field positioning
-        field_x, field_width, field_y = self._get_field_position()
+        field_x, field_width, field_y = self.generator.group_field.get_field_position()
         starting_y = field_y
         
         # Draw label with text wrapping
@@ -41,7 +41,7 @@ class SelectField:
         field_y_position = field_y - 5
 
         # Get options and create tooltip
-        options_list = _get_options(options)
+        options_list = list(field.choices)
         if options_list:
             option_strings = [f"{value}: {option_label}" for value, option_label in options_list]
             tooltip_text = f"{label} - Options: {', '.join([ol for v, ol in options_list])}"
@@ -73,49 +73,9 @@ class SelectField:
         final_field_y = field_y_position - self.field_height
 
         if self.generator.current_group is not None:
-            self._handle_group_positioning(field_x, field_width, final_field_y, starting_y)
+            self.generator.group_field.add_field_to_group(final_field_y, starting_y, row_gap=15)
         else:
             self.generator.current_y = final_field_y - 10
 
         c.setFont(current_font, current_size)
         c.setFillColor(current_color)
-
-    def _get_field_position(self):
-        field_x = self.margin_x
-        field_width = self.field_width
-        field_y = self.generator.current_y
-
-        if self.generator.current_group is not None:
-            group_index = len(self.generator.group_fields)
-            column_index = group_index % self.generator.group_columns
-            
-            field_x = self.margin_x
-            if column_index > 0:
-                field_x += sum(self.generator.column_widths[:column_index])
-                field_x += self.generator.group_spacing * column_index
-            
-            field_width = self.generator.column_widths[column_index]
-            
-            if column_index > 0 and self.generator.group_fields:
-                row_index = group_index // self.generator.group_columns
-                first_in_row_index = row_index * self.generator.group_columns
-                if first_in_row_index < len(self.generator.group_fields):
-                    first_field = self.generator.group_fields[first_in_row_index]
-                    field_y = first_field.get('start_y', first_field.get('y', field_y))
-
-        return field_x, field_width, field_y
-
-    def _handle_group_positioning(self, field_x, field_width, final_y, start_y):
-        self.generator.group_fields.append({
-            'name': 'select_field',
-            'x': field_x,
-            'y': final_y,
-            'start_y': start_y,
-            'width': field_width
-        })
-
-        if len(self.generator.group_fields) % self.generator.group_columns == 0:
-            row_start = len(self.generator.group_fields) - self.generator.group_columns
-            row_fields = self.generator.group_fields[row_start:]
-            min_y = min(f.get('y', self.generator.current_y) for f in row_fields)
-            self.generator.current_y = min_y - 15  # Increased from 10 for better separation between rows
\ No newline at end of file
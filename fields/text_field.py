@@ -1,18 +1,18 @@
 # fields/text_field.py - SIMPLIFIED WITH PROPER GROUP HANDLING
 
-from utils import draw_wrapped_text, create_acrobat_compatible_field, _check_page_break
+from utils import draw_wrapped_text, create_acrobat_compatible_field
 
 class TextField:
-    def __init__(self, generator, canvas):
+    def __init__(self, generator):
         self.generator = generator
-        self.canvas = canvas
         self.colors = generator.colors
         self.margin_x = generator.margin_x
         self.field_width = generator.field_width
         self.field_height = generator.field_height
 
-    def draw(self, field_name, label):
-        c = self.canvas
+    def draw(self, c, field):
+        field_name = field.name
+        label = field.label
         current_font = c._fontname
         current_size = c._fontsize
         current_color = c._fillColorObj
@@ -21,16 +21,6 @@ class TextField:
         field_x, field_width, field_y = self._get_field_position()
         starting_y = field_y
 
-        # Check for page break
-        needed_height = self.field_height + 25
-        if label:
-            needed_height += 20
-            
-        if _check_page_break(self.generator, c, needed_height):
-            self.generator.page_manager.initialize_page(c)
-            field_x, field_width, field_y = self._get_field_position()
-            starting_y = field_y
-
         # Draw label if present
         if label and label.strip():
             field_label_style = self.generator.label_styles['field_label']
@@ -60,9 +50,7 @@ class TextField:
 
         # Handle group positioning or update current_y
         if self.generator.current_group is not None:
-            from fields.group_field import GroupField
-            group_field = GroupField(self.generator, c)
-            group_field.add_field_to_group(field_name, final_field_y, starting_y, field_x, field_width)
+            self.generator.group_field.add_field_to_group(final_field_y, starting_y)
         else:
             self.generator.current_y = final_field_y - 20
 
@@ -73,8 +61,6 @@ class TextField:
     def _get_field_position(self):
         """Get field position, handling groups if active"""
         if self.generator.current_group is not None:
-            from fields.group_field import GroupField
-            group_field = GroupField(self.generator, self.canvas)
-            return group_field.get_field_position_in_group()
+            return self.generator.group_field.get_field_position_in_group()
         else:
             return self.margin_x, self.field_width, self.generator.current_y
\ No newline at end of file
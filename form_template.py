@@ -0,0 +1,166 @@
+# form_template.py - Compile a form once, then prefill copies without re-rendering
+import json
+import re
+
+from pdf_objects import PDFFile, append_update, pdf_string, pdf_name
+
+_NAME_RE = re.compile(rb'/T\s*\(((?:\\.|[^\\)])*)\)')
+_FT_RE = re.compile(rb'/FT\s*/(\w+)')
+_PARENT_RE = re.compile(rb'/Parent\s+(\d+)\s+0\s+R')
+_KIDS_RE = re.compile(rb'/Kids\s*\[')
+_TEXT_VALUE_RE = re.compile(rb'/(V)\s*\(\)')
+_STATE_RE = re.compile(rb'/(AS|V)\s*/Off\b')
+_APPEARANCE_STATE_RE = re.compile(rb'/(AS)\s*/Off\b')
+_NORMAL_AP_RE = re.compile(rb'/N\s*<<\s*(.*?)>>', re.DOTALL)
+_AP_NAME_RE = re.compile(rb'/([^\s/<>\[\]()]+)\s+\d+\s+0\s+R')
+_LITERAL_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+# Checkboxes drawn by ReportLab use /Yes as their "on" appearance state
+CHECKBOX_ON_STATE = 'Yes'
+
+
+def _decode_literal(raw):
+    out = re.sub(rb'\\(.)', lambda m: _LITERAL_ESCAPES.get(m.group(1), m.group(1)), raw)
+    return out.decode('latin-1')
+
+
+def _split_parts(body, pattern):
+    """Split body around each value so a new one can be spliced in with a join"""
+    parts = []
+    last = 0
+    for m in pattern.finditer(body):
+        # Keep the key; only the value after it is replaced
+        parts.append(body[last:m.start()] + b'/' + m.group(1) + b' ')
+        last = m.end()
+    parts.append(body[last:])
+    return parts
+
+
+class FormTemplate:
+    """A rendered form plus an index of where each field's value lives.
+
+    ``slots`` maps the PDF field name to a slot dict:
+      - text:     {'kind': 'text', 'obj': n, 'parts': [before, after]}
+      - checkbox: {'kind': 'checkbox', 'obj': n, 'parts': [...]} (one gap per state key)
+      - radio:    {'kind': 'radio', 'obj': parent, 'parts': [before, after],
+                   'kids': {export_value: [obj, parts]}}
+    """
+    def __init__(self, pdf, slots):
+        self.pdf = pdf
+        self.slots = slots
+        self._source = PDFFile(pdf)
+
+    @classmethod
+    def from_pdf(cls, pdf):
+        """Build the field-slot index from a generated PDF"""
+        source = PDFFile(pdf)
+        slots = {}
+        radio_kids = {}
+
+        for num, body in source.iter_objects():
+            ft = _FT_RE.search(body)
+            parent = _PARENT_RE.search(body)
+
+            if parent and ft and ft.group(1) == b'Btn':
+                ap = _NORMAL_AP_RE.search(body)
+                states = [s for s in _AP_NAME_RE.findall(ap.group(1)) if s != b'Off'] if ap else []
+                if states:
+                    radio_kids.setdefault(int(parent.group(1)), {})[states[0].decode('latin-1')] = \
+                        [num, _split_parts(body, _APPEARANCE_STATE_RE)]
+                continue
+
+            name = _NAME_RE.search(body)
+            if not (ft and name):
+                continue
+            field_name = _decode_literal(name.group(1))
+
+            if ft.group(1) == b'Tx' and _TEXT_VALUE_RE.search(body):
+                slots[field_name] = {'kind': 'text', 'obj': num,
+                                     'parts': _split_parts(body, _TEXT_VALUE_RE)}
+            elif ft.group(1) == b'Btn' and _KIDS_RE.search(body):
+                # Radio group parent; the selected value is inserted as /V
+                end = body.rindex(b'>>')
+                slots[field_name] = {'kind': 'radio', 'obj': num,
+                                     'parts': [body[:end], body[end:]], 'kids': {}}
+            elif ft.group(1) == b'Btn' and _STATE_RE.search(body):
+                slots[field_name] = {'kind': 'checkbox', 'obj': num,
+                                     'parts': _split_parts(body, _STATE_RE)}
+
+        for slot in slots.values():
+            if slot['kind'] == 'radio':
+                slot['kids'] = radio_kids.get(slot['obj'], {})
+
+        return cls(pdf, slots)
+
+    # ---------- persistence ----------
+
+    def save(self, pdf_path):
+        """Write the template PDF and its slot index (<pdf_path>.slots.json)"""
+        with open(pdf_path, 'wb') as f:
+            f.write(self.pdf)
+        with open(pdf_path + '.slots.json', 'w', encoding='utf-8') as f:
+            json.dump(self.slots, f, default=lambda b: b.decode('latin-1'))
+
+    @classmethod
+    def load(cls, pdf_path):
+        with open(pdf_path, 'rb') as f:
+            pdf = f.read()
+        with open(pdf_path + '.slots.json', 'r', encoding='utf-8') as f:
+            raw_slots = json.load(f)
+
+        def to_bytes(parts):
+            return [p.encode('latin-1') for p in parts]
+
+        for slot in raw_slots.values():
+            slot['parts'] = to_bytes(slot['parts'])
+            for kid in slot.get('kids', {}).values():
+                kid[1] = to_bytes(kid[1])
+        return cls(pdf, raw_slots)
+
+
+def compile_template(json_data, generator_factory=None):
+    """Render a form definition once into a reusable FormTemplate"""
+    if generator_factory is None:
+        from jsonToPDF import ModernPDFFormGenerator as generator_factory
+
+    return FormTemplate.from_pdf(generator_factory(json_data).generate_pdf_bytes())
+
+
+def prefill(template, values, output_filename=None):
+    """Return a filled copy of the template as PDF bytes.
+
+    ``values`` maps PDF field names to text (text fields), a bool
+    (checkboxes) or the export value of the chosen option (radio groups).
+    The copy is the template plus one appended incremental update holding
+    only the changed field objects, so nothing is laid out or re-rendered.
+    """
+    objects = {}
+    for name, value in values.items():
+        slot = template.slots.get(name)
+        if slot is None:
+            raise KeyError(f"Unknown form field: {name}")
+
+        kind = slot['kind']
+        if kind == 'text':
+            token = pdf_string('' if value is None else value)
+            objects[slot['obj']] = token.join(slot['parts'])
+        elif kind == 'checkbox':
+            token = pdf_name(CHECKBOX_ON_STATE if value else 'Off')
+            objects[slot['obj']] = token.join(slot['parts'])
+        elif kind == 'radio':
+            if value is None or value == '':
+                continue
+            kid = slot['kids'].get(str(value))
+            if kid is None:
+                raise ValueError(f"'{value}' is not an option of radio group '{name}'")
+            token = pdf_name(value)
+            objects[slot['obj']] = slot['parts'][0] + b'/V ' + token + b' ' + slot['parts'][1]
+            kid_obj, kid_parts = kid
+            objects[kid_obj] = token.join(kid_parts)
+
+    filled = append_update(template.pdf, objects, pdf=template._source) if objects else template.pdf
+
+    if output_filename:
+        with open(output_filename, 'wb') as f:
+            f.write(filled)
+    return filled
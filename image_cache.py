@@ -0,0 +1,107 @@
+# image_cache.py - Process-wide cache of decoded, pre-scaled images
+import mmap
+import os
+from collections import OrderedDict
+
+from reportlab.lib.utils import ImageReader
+
+try:
+    from PIL import Image
+except ImportError:     # ReportLab can still embed JPEGs without PIL
+    Image = None
+
+# Pixels per inch kept when an image is scaled down to its box; anything
+# finer only adds bytes to every PDF
+IMAGE_DPI = 150
+
+# Decoded images kept per process
+IMAGE_CACHE_SIZE = 32
+
+
+class ImageAsset(ImageReader):
+    """An image decoded once and resampled to fit a box.
+
+    ``width`` and ``height`` are the size to draw in points; the pixels
+    behind them are at most IMAGE_DPI. The RGB data is converted once, so
+    every document that draws the asset skips decoding. Pickling stores
+    only how to load the asset again, which keeps cached layouts small.
+    """
+    def __init__(self, image, load_args, source_key, width, height):
+        ImageReader.__init__(self, image)
+        self.load_args = load_args
+        self.source_key = source_key
+        self.width = width
+        self.height = height
+        self.getRGBData()
+
+    def __reduce__(self):
+        return (load_image, self.load_args)
+
+
+_assets = OrderedDict()
+
+
+def _fit(pixel_width, pixel_height, max_width, max_height):
+    """Point size of an image shrunk to fit the box, never scaled up"""
+    width_ratio = max_width / pixel_width if pixel_width > 0 else 1
+    height_ratio = max_height / pixel_height if pixel_height > 0 else 1
+    scale_ratio = min(width_ratio, height_ratio, 1)
+    return pixel_width * scale_ratio, pixel_height * scale_ratio
+
+
+def _decode(path, max_width, max_height, dpi):
+    """Read path through a memory map and resample it for the box"""
+    with open(path, 'rb') as source:
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            image = Image.open(mapped)
+            image.load()
+
+    width, height = _fit(image.width, image.height, max_width, max_height)
+    pixels = (max(1, round(width * dpi / 72)), max(1, round(height * dpi / 72)))
+    if pixels[0] < image.width and pixels[1] < image.height:
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        image = image.resize(pixels, Image.LANCZOS)
+    return image, width, height
+
+
+def load_image(path, max_width=150, max_height=50, dpi=IMAGE_DPI):
+    """Cached ImageAsset for path fitted to the box, or None if it can't be read.
+
+    Entries are keyed by the file's mtime and size as well as the box, so
+    an edited logo is picked up by the next document.
+    """
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    source_key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    key = source_key + (max_width, max_height, dpi)
+    asset = _assets.get(key)
+    if asset is not None:
+        _assets.move_to_end(key)
+        return asset
+
+    try:
+        if Image is not None:
+            image, width, height = _decode(path, max_width, max_height, dpi)
+        else:
+            # Without PIL only the original file can be embedded
+            image = path
+            width, height = max_width, max_height
+        asset = ImageAsset(image, (path, max_width, max_height, dpi), source_key, width, height)
+    except Exception as e:
+        print(f"Error preparing image {path}: {e}")
+        return None
+
+    _assets[key] = asset
+    if len(_assets) > IMAGE_CACHE_SIZE:
+        _assets.popitem(last=False)
+    return asset
+
+
+def clear_image_cache():
+    _assets.clear()
@@ -1,4 +1,6 @@
+import io
 import os
+import sys
 from dotenv import load_dotenv
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
@@ -18,18 +20,54 @@ from constants import (
 )
 from label_styles import LABEL_STYLES
 from page_manager import PageManager
+from layout_plan import LayoutPlan, LayoutCanvas, render_plan, render_page, render_forms
+from layout_cache import layout_cache_key, get_default_layout_cache
 from label_manager import LabelManager
+from field_spec import parse_fields, HTML_H1
 from fields.text_field import TextField
 from fields.text_area import TextArea
 from fields.check_box import CheckBox
 from fields.radio_button import RadioButton
 from fields.group_field import GroupField
 from fields.select_field import SelectField
-from utils import _calculate_field_height, _check_page_break
+from paginator import Paginator
+from page_compression import compress_page_streams
+from object_streams import compact_pdf
+from pdf_stream_writer import StreamingPDFWriter
+from appearance_cache import install_shared_appearances
+from pdf_objects import update_pdf_file, set_need_appearances
+from env import get_compression_level, get_compact_output
+
+# Default renderer class for each field type. Renderers are built once per
+# generator and must provide draw(canvas, field). Unknown types are drawn
+# with the 'text' renderer.
+FIELD_RENDERERS = {
+    'text': TextField,
+    'email': TextField,
+    'date': TextField,
+    'select': SelectField,
+    'textarea': TextArea,
+    'radio': RadioButton,
+    'checkbox': CheckBox,
+}
+
+
+def register_field_type(field_type, renderer_class):
+    """Register a renderer class for a field type on all new generators"""
+    FIELD_RENDERERS[field_type.lower().strip()] = renderer_class
+
 
 class ModernPDFFormGenerator:
-    def __init__(self, json_data):
+    def __init__(self, json_data, layout_cache=None, compression_level=None, compact=None):
         self.data = json_data
+        # Pass False to always lay the form out from scratch
+        self.layout_cache = get_default_layout_cache() if layout_cache is None else layout_cache
+        # zlib level for page streams; None keeps them uncompressed
+        self.compression_level = get_compression_level() if compression_level is None else compression_level
+        # Pack objects into object streams with an xref stream (PDF 1.5)
+        self.compact = get_compact_output() if compact is None else compact
+        # Pages in the most recently generated PDF
+        self.page_count = None
         self.page_width, self.page_height = letter
         
         # REMOVED: Font registration - using standard fonts instead
@@ -39,6 +77,9 @@ class ModernPDFFormGenerator:
         self.margin_x = MARGINS['x']
         self.margin_bottom = MARGINS['bottom']
         self.current_y = self.page_height - MARGINS['x']
+        self.page_top_y = self.current_y
+        # Canvas checkpoint taken when the current page was set up
+        self.page_start = None
         self.field_width = FIELD_DIMENSIONS['width']
         self.field_height = FIELD_DIMENSIONS['height']
         self.current_page = 1
@@ -54,20 +95,46 @@ class ModernPDFFormGenerator:
         
         # Group handling
         self.current_group = None
-        self.group_fields = []
+        self.group_grid = None
         self.group_configs = GROUP_CONFIGS
-        self.column_widths = None
-        self.group_spacing = None
-        self.group_columns = None
-        self.group_start_y = None
 
         self.page_manager = PageManager(self)
         self.label_manager = LabelManager(self)
+        self.group_field = GroupField(self)
+        self.paginator = Paginator(self)
+
+        # Field renderers, one instance per class, looked up by field type
+        self.field_renderers = {}
+        self._renderer_instances = {}
+        for field_type, renderer_class in FIELD_RENDERERS.items():
+            self.register_field_type(field_type, renderer_class)
 
         # Get the first key and parse form data
         self.form_key = self._get_first_form_key()
         self.form_data = self._find_form_data()
+
+        # Parse raw field dicts once; layout and drawing only see FieldSpecs
+        self.fields = parse_fields(self._get_fields())
         
+    def register_field_type(self, field_type, renderer_class):
+        """Use renderer_class to draw fields of field_type on this generator.
+
+        The class is instantiated once with the generator and its
+        draw(canvas, field) method is called for every matching FieldSpec.
+        """
+        renderer = self._renderer_instances.get(renderer_class)
+        if renderer is None:
+            renderer = renderer_class(self)
+            self._renderer_instances[renderer_class] = renderer
+        self.field_renderers[field_type.lower().strip()] = renderer
+
+    def _renderer_key(self):
+        """Identify the renderer set so cached layouts are not shared across different ones"""
+        return sorted(
+            (field_type, f"{type(renderer).__module__}.{type(renderer).__qualname__}")
+            for field_type, renderer in self.field_renderers.items()
+        )
+
     def _setup_canvas_for_acrobat(self, c):
         """CRITICAL: Set up canvas for Adobe Acrobat compatibility"""
         # Use only standard PDF fonts that don't need registration
@@ -165,61 +232,34 @@ class ModernPDFFormGenerator:
             print("Warning: No fields found in form data")
             return []
 
-    def _draw_field(self, c, field_type, field_name, label, options):
+    def _draw_field(self, c, field):
         current_font = c._fontname
         current_size = c._fontsize
         current_color = c._fillColorObj
+        field_type = field.type
 
         if field_type == 'group_start':
-            from fields.group_field import GroupField
-            group_field = GroupField(self, c)
-            group_field.start_group(field_name)
+            self.group_field.start_group(field.name)
             return
         elif field_type == 'group_end':
-            from fields.group_field import GroupField
-            group_field = GroupField(self, c)
-            group_field.end_group()
+            self.group_field.end_group()
             return
 
         # Handle label-only fields
         if field_type == 'label':
-            style = self.label_manager.get_label_style(field_type, label)
-            draw_line = '<h1>' in label.lower()
-            self.label_manager.draw_label(c, label, style, draw_line)
+            style = self.label_manager.get_label_style(field_type, field.label)
+            draw_line = field.has_html(HTML_H1)
+            self.label_manager.draw_label(c, field.label, style, draw_line)
         else:
-            # Handle form fields
+            # Handle form fields; unknown types fall back to a text field
+            fallback = self.field_renderers['text']
+            renderer = self.field_renderers.get(field_type, fallback)
             try:
-                if field_type in ['text', 'email', 'date']:
-                    from fields.text_field import TextField
-                    text_field = TextField(self, c)
-                    text_field.draw(field_name, label)
-                elif field_type == 'select':
-                    from fields.select_field import SelectField
-                    select_field = SelectField(self, c)
-                    select_field.draw(field_name, label, options)
-                elif field_type == 'textarea':
-                    from fields.text_area import TextArea
-                    text_area = TextArea(self, c)
-                    text_area.draw(field_name, label)
-                elif field_type == 'radio':
-                    from fields.radio_button import RadioButton
-                    radio_button = RadioButton(self, c)
-                    radio_button.draw(field_name, label, options)
-                elif field_type == 'checkbox':
-                    from fields.check_box import CheckBox
-                    check_box = CheckBox(self, c)
-                    check_box.draw(field_name, label, options)
-                else:
-                    # Fallback for unknown field types
-                    from fields.text_field import TextField
-                    text_field = TextField(self, c)
-                    text_field.draw(field_name, label)
+                renderer.draw(c, field)
             except Exception as e:
-                print(f"Error drawing field '{field_name}' of type '{field_type}': {e}")
+                print(f"Error drawing field '{field.name}' of type '{field_type}': {e}")
                 # Fallback to text field
-                from fields.text_field import TextField
-                text_field = TextField(self, c)
-                text_field.draw(field_name, f"{label} (Error: treated as text)")
+                fallback.draw(c, field.with_label(f"{field.label} (Error: treated as text)"))
                     
         c.setFont(current_font, current_size)
         c.setFillColor(current_color)
@@ -229,198 +269,191 @@ class ModernPDFFormGenerator:
         if self.current_group is not None:
             # Store current group info
             temp_group = self.current_group
-            temp_config = {
-                'columns': self.group_columns,
-                'widths': [w / (self.field_width - self.group_spacing * (self.group_columns - 1)) 
-                        for w in self.column_widths] if self.column_widths else [0.5, 0.5],
-                'spacing': self.group_spacing
-            }
             
             # End current group
-            from fields.group_field import GroupField
-            group_field = GroupField(self, c)
+            group_field = self.group_field
             group_field.end_group()
             
             # Start new page
-            self.current_page += 1
-            self.page_manager.initialize_page(c)
+            self.page_manager.new_page(c)
             
             # Restart the group on new page
             group_field.start_group(temp_group)
         else:
             # Normal page break
-            self.current_page += 1
-            self.page_manager.initialize_page(c)
+            self.page_manager.new_page(c)
 
-    # In your ModernPDFFormGenerator class, update the _process_fields method:
+    def _process_fields(self, c):
+        """Place every field, breaking pages from measured layout"""
+        self.paginator.place_fields(c, self.fields)
 
-    def _process_fields(self, c, total_pages=None):
-        fields = self._get_fields()
-        num_fields = len(fields)
-        
-        i = 0
-        while i < num_fields:
-            field = fields[i]
-            
-            label = field.get('label', '')
-            field_name = field.get('name', '')
-            field_type = field.get('type', '').lower().strip()
-
-            prev_field_type = fields[i-1].get('type', '').lower().strip() if i > 0 else None
-            next_field_type = fields[i+1].get('type', '').lower().strip() if i+1 < num_fields else None
-
-            # Skip submission fields
-            if field_type in ['pdf_download', 'submit']:
-                i += 1
-                continue
-
-            # --- DYNAMIC LOGIC: Force new row for specific fields or radio between text fields ---
-            # Check for Women Only label by content
-            is_women_only_label = (field_type == 'label' and 
-                                'women only' in label.lower() and 
-                                'are you' in label.lower())
-            
-            if (field_name in FULL_WIDTH_FIELDS or 
-                is_women_only_label or
-                (field_type == 'radio' and 
-                (prev_field_type == 'text' or next_field_type == 'text') and 
-                self.current_group is None)):
-                
-                # Temporarily end current group if any
-                temp_group = self.current_group
-                if self.current_group:
-                    group_field = GroupField(self, c)
-                    group_field.end_group()
-                    self.current_group = None
-                
-                # Draw the field as full-width
-                self._draw_field(c, field_type, field_name, label, field.get('option', {}))
-                i += 1
-                
-                # Restore the group if we temporarily ended it
-                if temp_group:
-                    group_field = GroupField(self, c)
-                    group_field.start_group(temp_group)
-                
-                continue
-
-            # Calculate needed height with reasonable estimates
-            needed_height = _calculate_field_height(
-                field_type, label, field.get('option', {}), 
-                self.field_width, self.field_height, 
-                self.label_styles
-            )
-
-            if _check_page_break(self, c, needed_height):
-                # CRITICAL: Increment page counter BEFORE initializing new page
-                self.current_page += 1
-                
-                self.page_manager.initialize_page(c)
-                if self.current_group:
-                    self.group_fields = []
-                    self.group_start_y = self.current_y
+    def _reset_layout_state(self):
+        """Reset the flow position so a layout can start from the first page"""
+        self.current_page = 1
+        self.current_y = self.page_height - self.margin_x
+        self.page_top_y = self.current_y
+        self.page_start = None
+        self.current_group = None
+        self.group_grid = None
 
-            # Draw the field
-            self._draw_field(c, field_type, field_name, label, field.get('option', {}))
-            i += 1
+    def build_layout(self, on_page=None, keep_pages=True):
+        """Lay out every field into a canvas-independent LayoutPlan.
+
+        ``on_page`` and ``keep_pages`` are passed to LayoutCanvas, to get
+        each page as soon as its layout is final.
+        """
+        plan = LayoutPlan(self.page_width, self.page_height, self._get_form_title())
+        c = LayoutCanvas(plan, on_page=on_page, keep_pages=keep_pages)
+        self._reset_layout_state()
 
-    def generate_pdf(self, output_filename):
-        """Updated with minimal Adobe Acrobat compatibility fixes"""
-        # First pass to count pages
-        c = canvas.Canvas(
-            output_filename, 
-            pagesize=letter,
-            pageCompression=0,  # Better Adobe compatibility
-            encoding='WinAnsiEncoding'  # Most compatible encoding
-        )
-        
-        form_title = self._get_form_title()
-        c.setTitle(form_title)
-        c.acroForm.needAppearances = True
-        c.acroForm.sigFlags = 0
-        
         # CRITICAL: Set up for Adobe compatibility
         self._setup_canvas_for_acrobat(c)
-        
+
         self.page_manager.initialize_page(c)
         self._process_fields(c)
-        total_pages = c.getPageNumber()
-        c.save()
 
-        # Second pass with page numbers - reset state
-        self.current_page = 1
-        self.current_y = self.page_height - self.margin_x
-        self.current_group = None
-        self.group_fields = []
-        
+        # "Page X of Y" totals are deferred form XObjects, filled in here
+        self.page_manager.finish_document(c)
+        return c.close()
+
+    def get_layout(self, on_page=None):
+        """Return the form's LayoutPlan, reusing a cached one when the definition is unchanged.
+
+        ``on_page(ops)`` is called with each page in order, while the form
+        is being laid out or straight from the cached plan. Without a
+        layout cache the returned plan then holds no page content.
+        """
+        if not self.layout_cache:
+            return self.build_layout(on_page, keep_pages=on_page is None)
+
+        key = layout_cache_key(self.data, extra=self._renderer_key())
+        plan = self.layout_cache.get(key)
+        if plan is None:
+            plan = self.build_layout(on_page)
+            self.layout_cache.put(key, plan)
+        elif on_page is not None:
+            for ops in plan.pages:
+                on_page(ops)
+        return plan
+
+    def _new_canvas(self, output_filename):
         c = canvas.Canvas(
             output_filename, 
             pagesize=letter,
             pageCompression=0,  # Better Adobe compatibility
             encoding='WinAnsiEncoding'  # Most compatible encoding
         )
-        c.setTitle(form_title)
+        install_shared_appearances(c)
         c.acroForm.needAppearances = True
         c.acroForm.sigFlags = 0
-        
-        # CRITICAL: Set up for Adobe compatibility again
-        self._setup_canvas_for_acrobat(c)
-        
-        self.page_manager.initialize_page(c)
-        self._process_fields(c, total_pages)
-        c.save()
+        return c
+
+    def _render_pdf_data(self, output_filename=None):
+        """Lay out the form once and render it to the finished PDF bytes"""
+        plan = self.get_layout()
+        c = self._new_canvas(output_filename)
+        render_plan(plan, c)
+        if self.compression_level is not None:
+            compress_page_streams(c, self.compression_level)
+        data = c.getpdfdata()
+        if self.compact:
+            data = compact_pdf(data, 6 if self.compression_level is None else self.compression_level)
+        self.page_count = plan.page_count
+        return data
+
+    def generate_pdf_bytes(self):
+        """Render the form with Adobe Acrobat compatibility settings and return the PDF bytes"""
+        return self._render_pdf_data()
+
+    def generate_pdf_to(self, sink):
+        """Render the form and write it to a writable binary object or socket.
+
+        Anything with write() (BytesIO, an open file, a pipe) or sendall()
+        (a socket) works; nothing touches the filesystem. Returns the
+        number of pages written.
+        """
+        _write_all(sink, self._render_pdf_data())
+        return self.page_count
+
+    def generate_pdf_stream(self, sink):
+        """Render the form into a sink, writing each page as soon as it is finished.
+
+        Layout and rendering run page by page: once the paginator can no
+        longer move anything on a page, it is drawn on the real canvas and
+        written to ``sink`` (anything generate_pdf_to accepts), so the first
+        bytes go out after the first page is laid out rather than the whole
+        document. Without a layout cache only the pages still being laid
+        out are held in memory; a cached plan keeps every page by design.
+        Compact output needs the whole file, so with ``compact`` set this
+        falls back to generate_pdf_to(). Returns the number of pages written.
+        """
+        if self.compact:
+            return self.generate_pdf_to(sink)
+        c = self._new_canvas(None)
+        writer = StreamingPDFWriter(c, lambda data: _write_all(sink, data), self.compression_level)
+
+        def write_page(ops):
+            render_page(c, ops)
+            writer.page_done()
+
+        plan = self.get_layout(on_page=write_page)
+        render_forms(plan, c)
+        writer.finish()
+        self.page_count = plan.page_count
+        return self.page_count
+
+    def generate_pdf(self, output_filename):
+        """Lay out the form once, then render it with Adobe Acrobat compatibility settings.
+
+        ``output_filename`` is a path or a writable binary object. Returns
+        the number of pages written.
+        """
+        if hasattr(output_filename, 'write'):
+            return self.generate_pdf_to(output_filename)
+        data = self._render_pdf_data(output_filename)
+        with open(output_filename, 'wb') as f:
+            f.write(data)
+        return self.page_count
         
     def _fix_pdf_for_acrobat_minimal(self, pdf_path):
         """Minimal PDF fix that doesn't interfere with radio buttons"""
         try:
-            from PyPDF2 import PdfReader, PdfWriter
-            from PyPDF2.generic import BooleanObject, NameObject
-            
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            # ONLY add NeedAppearances flag, don't modify anything else
-            for page_num, page in enumerate(reader.pages):
-                writer.add_page(page)
-            
-            # Add ONLY the NeedAppearances flag to the catalog
-            if hasattr(writer, '_root_object') and writer._root_object:
-                if "/AcroForm" not in writer._root_object:
-                    writer._root_object[NameObject("/AcroForm")] = {}
-                writer._root_object[NameObject("/AcroForm")][NameObject("/NeedAppearances")] = BooleanObject(True)
-            
-            # Write back
-            with open(pdf_path, "wb") as output_file:
-                writer.write(output_file)
-                
-            
+            # ONLY set the NeedAppearances flag: the AcroForm object is
+            # appended as an incremental update, nothing else is touched
+            update_pdf_file(pdf_path, set_need_appearances)
         except Exception as e:
             print(f"Minimal PDF processing failed: {e}")
         
     def generate_pdf_no_postprocessing(self, output_filename):
         """Generate PDF without any post-processing that might break radio buttons"""
         # Single pass - no post-processing
-        c = canvas.Canvas(
-            output_filename, 
-            pagesize=letter,
-            pageCompression=0,
-            encoding='WinAnsiEncoding'
-        )
-        
-        form_title = self._get_form_title()
-        c.setTitle(form_title)
-        
-        # Set needAppearances directly in ReportLab
-        c.acroForm.needAppearances = True
-        c.acroForm.sigFlags = 0
-        
-        self._setup_canvas_for_acrobat(c)
-        self.page_manager.initialize_page(c)
-        self._process_fields(c)
-        c.save()
+        self.generate_pdf(output_filename)
         
 
 
+def _write_all(sink, data):
+    """Write data to a file-like object or socket, retrying short writes.
+
+    Raises OSError if the sink stops accepting bytes, e.g. BlockingIOError
+    from a non-blocking raw stream that is full.
+    """
+    if not hasattr(sink, 'write'):
+        sink.sendall(data)
+        return
+    view = memoryview(data)
+    while view:
+        written = sink.write(view)
+        if written is None:
+            if isinstance(sink, io.RawIOBase):
+                # A non-blocking raw stream that could not take anything now
+                raise BlockingIOError(f"sink accepted none of {len(view)} bytes")
+            # A plain object whose write() returns nothing has taken it all
+            return
+        if written == 0:
+            raise OSError(f"sink accepted none of {len(view)} bytes")
+        view = view[written:]
+
+
 # FIXED: Functions moved outside the class (correct indentation)
 def generate_form_pdf(json_file_path, output_pdf_path):
     """Generate form PDF from JSON file"""
@@ -435,6 +468,15 @@ def generate_form_pdf(json_file_path, output_pdf_path):
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ['--bulk']:
+        # NDJSON records from a file or stdin, see batch.main
+        from batch import main as bulk_main
+        sys.exit(bulk_main(sys.argv[2:]))
+    if sys.argv[1:2] == ['--serve']:
+        # Local HTTP rendering service, see service.main
+        from service import main as serve_main
+        sys.exit(serve_main(sys.argv[2:]))
+
     # Get paths from environment variables with fallback defaults
     json_path = os.getenv('JSON_INPUT_PATH', 
                          '/Users/camerondyas/Documents/scripts/pythonScripts/JSONToPDF/form/form.json')
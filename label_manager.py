@@ -1,6 +1,9 @@
 # label_manager.py - Enhanced version with ol support and smart page break detection
 import re
-from utils import _strip_html_tags, _wrap_text, _check_page_break
+from utils import _strip_html_tags, _wrap_text
+from text_metrics import string_width
+from label_parser import parse_label
+from constants import PAGINATION
 
 class LabelManager:
     def __init__(self, generator):
@@ -9,169 +12,20 @@ class LabelManager:
         self.margin_x = generator.margin_x
         self.field_width = generator.field_width
         self.colors = generator.colors
+        # Page the last split label started on, None if it drew nothing
+        self.first_line_page = None
+        # Set by the paginator to split a keep-together label taller than a page
+        self.force_split = False
 
     def get_label_style(self, field_type, label):
         """Determine the appropriate label style based on content"""
-        if field_type == 'label':
-            if '<h1>' in label.lower():
-                return self.label_styles['h1']
-            elif '<h3>' in label.lower():
-                return self.label_styles['h3']
-            elif '<h4>' in label.lower():
-                return self.label_styles['h4']
-            elif '<h5>' in label.lower():
-                return self.label_styles['h5']
-            elif '<p>' in label.lower():
-                # Check if there are lists INSIDE the paragraph (both ul and ol)
-                if '<ul>' in label.lower() or '<li>' in label.lower() or '<ol>' in label.lower():
-                    return self.label_styles.get('ul', self.label_styles['p'])
-                else:
-                    return self.label_styles['p']
-            elif '<ul>' in label.lower() or '<li>' in label.lower() or '<ol>' in label.lower():
-                return self.label_styles.get('ul', self.label_styles['p'])
-            else:
-                return self.label_styles['regular']
-        else:
+        if field_type != 'label':
             return self.label_styles['field_label']
 
-    def _extract_link_text(self, html_text):
-        """Extract text from links, preserving just the inner HTML of <a> tags"""
-        # Pattern to match <a> tags and capture their inner content
-        link_pattern = r'<a[^>]*>(.*?)</a>'
-        
-        def replace_link(match):
-            return match.group(1)  # Return just the inner content
-        
-        return re.sub(link_pattern, replace_link, html_text, flags=re.IGNORECASE | re.DOTALL)
-
-    def _process_list_content(self, html_text):
-        """Process <ul>/<ol> and <li> tags to create formatted list text with proper numbering"""
-        
-        # Check if this is an ordered list (ol) or unordered list (ul)
-        is_ordered_list = '<ol>' in html_text.lower() or '<ol ' in html_text.lower()
-        
-        # Handle nested lists by preserving structure
-        # First, let's identify if we have multiple lists or nested lists
-        ol_matches = list(re.finditer(r'<ol[^>]*>.*?</ol>', html_text, flags=re.IGNORECASE | re.DOTALL))
-        ul_matches = list(re.finditer(r'<ul[^>]*>.*?</ul>', html_text, flags=re.IGNORECASE | re.DOTALL))
-        
-        if ol_matches or ul_matches:
-            # We have structured lists, process them individually
-            return self._process_structured_lists(html_text)
-        else:
-            # Legacy processing for simple list items
-            return self._process_simple_list_items(html_text, is_ordered_list)
-
-    def _process_structured_lists(self, html_text):
-        """Process structured <ol> and <ul> lists with proper numbering and letter support"""
-        result_lines = []
-        current_pos = 0
-        
-        # Find all list blocks (both ol and ul)
-        list_pattern = r'(<(ol|ul)[^>]*>.*?</\2>)'
-        matches = list(re.finditer(list_pattern, html_text, flags=re.IGNORECASE | re.DOTALL))
-        
-        for match in matches:
-            # Add any text before this list
-            before_text = html_text[current_pos:match.start()].strip()
-            if before_text:
-                clean_before = _strip_html_tags(before_text).strip()
-                if clean_before:
-                    result_lines.extend(clean_before.split('\n'))
-            
-            # Process the list
-            list_html = match.group(1)
-            list_type = match.group(2).lower()
-            
-            # Check for letter-style attribute in ol tags
-            is_letter_style = False
-            use_uppercase = False
-            if list_type == 'ol':
-                # Check for type="a" or type="A" attributes
-                type_match = re.search(r'type=["\']([aA])["\']', list_html, re.IGNORECASE)
-                if type_match:
-                    is_letter_style = True
-                    use_uppercase = type_match.group(1) == 'A'
-            
-            # Extract list items
-            li_pattern = r'<li[^>]*>(.*?)</li>'
-            li_matches = re.findall(li_pattern, list_html, flags=re.IGNORECASE | re.DOTALL)
-            
-            list_counter = 1
-            for li_content in li_matches:
-                clean_content = _strip_html_tags(li_content).strip()
-                if clean_content:
-                    if list_type == 'ol':
-                        if is_letter_style:
-                            # Convert number to letter (1=a, 2=b, etc.)
-                            letter = chr(ord('a') + list_counter - 1)
-                            if use_uppercase:
-                                letter = letter.upper()
-                            result_lines.append(f"{letter}. {clean_content}")
-                        else:
-                            # Regular numbered list
-                            result_lines.append(f"{list_counter}. {clean_content}")
-                        list_counter += 1
-                    else:  # ul
-                        result_lines.append(f"• {clean_content}")
-            
-            current_pos = match.end()
-        
-        # Add any remaining text after the last list
-        remaining_text = html_text[current_pos:].strip()
-        if remaining_text:
-            clean_remaining = _strip_html_tags(remaining_text).strip()
-            if clean_remaining:
-                result_lines.extend(clean_remaining.split('\n'))
-        
-        return '\n'.join(result_lines)
-
-    def _process_simple_list_items(self, text, is_ordered_list):
-        """Legacy processing for simple list items (fallback)"""
-        # Remove <p> and </p> tags but keep the content
-        text = re.sub(r'<p[^>]*>', '\n\n', text, flags=re.IGNORECASE)
-        text = re.sub(r'</p>', '', text, flags=re.IGNORECASE)
-        
-        # Remove <ul>, </ul>, <ol>, and </ol> tags
-        text = re.sub(r'</?[uo]l[^>]*>', '\n', text, flags=re.IGNORECASE)
-        
-        # Replace <li> tags with appropriate markers
-        if is_ordered_list:
-            # For ordered lists, we'll use a placeholder that we'll replace with numbers
-            text = re.sub(r'<li[^>]*>', '\n##LISTITEM##', text, flags=re.IGNORECASE)
-        else:
-            # For unordered lists, use bullet points
-            text = re.sub(r'<li[^>]*>', '\n• ', text, flags=re.IGNORECASE)
-        
-        text = re.sub(r'</li>', '', text, flags=re.IGNORECASE)
-        
-        # Clean up extra whitespace but preserve line breaks
-        lines = text.split('\n')
-        processed_lines = []
-        list_counter = 1
-        
-        for line in lines:
-            line = line.strip()
-            if line:
-                if line.startswith('##LISTITEM##'):
-                    # Replace placeholder with numbered list item
-                    line = f"{list_counter}. " + line[12:]  # Remove ##LISTITEM## and add number
-                    list_counter += 1
-                processed_lines.append(line)
-        
-        return '\n'.join(processed_lines)
-
-    def _clean_html_content(self, html_text):
-        """Clean HTML content by handling links and lists before stripping tags"""
-        # First, extract link text (preserve inner HTML of <a> tags)
-        text = self._extract_link_text(html_text)
-        
-        # Handle lists if present (both ul and ol)
-        if '<ul>' in text.lower() or '<li>' in text.lower() or '<ol>' in text.lower():
-            text = self._process_list_content(text)
-        
-        # Finally strip remaining HTML tags
-        return _strip_html_tags(text)
+        style_key = parse_label(label).style_key
+        if style_key == 'ul':
+            return self.label_styles.get('ul', self.label_styles['p'])
+        return self.label_styles[style_key]
 
     def draw_label(self, canvas, label, style, draw_line=False, spacing_before=None, tight=False):
         """Draw label with enhanced HTML processing"""
@@ -183,15 +37,13 @@ class LabelManager:
         current_size = canvas._fontsize
         current_color = canvas._fillColorObj
 
-        # Clean the label text using enhanced HTML processing
-        clean_text = self._clean_html_content(label)
+        # Links, lists and tags are resolved once per distinct label
+        parsed = parse_label(label)
+        self.first_line_page = None
 
         # Skip empty labels
-        if not clean_text.strip():
+        if not parsed.text.strip():
             return
-
-        # Check for splittable marker in the original label
-        allow_splitting = 'data-split="true"' in label or 'data-splittable="true"' in label
         
         # Apply spacing_before if provided, otherwise use style's spacing_before
         if spacing_before is not None:
@@ -203,12 +55,8 @@ class LabelManager:
         canvas.setFont(style.font_name, style.font_size)
         canvas.setFillColor(style.color)
 
-        # Determine content type - lists take absolute priority (both ul and ol)
-        is_list = "<ul>" in label.lower() or "<li>" in label.lower() or "<ol>" in label.lower()
-        is_paragraph = "<p>" in label.lower() and "</p>" in label.lower() and not is_list
-
         # Use full page width for paragraphs and lists, field width for others
-        if is_paragraph or is_list:
+        if parsed.is_paragraph or parsed.is_list:
             wrap_width = self.generator.page_width - 2 * self.generator.margin_x
             line_height = style.font_size + 6  # Increased line height for paragraphs and lists
         else:
@@ -216,19 +64,22 @@ class LabelManager:
             line_height = style.font_size + 1  # Normal line height for other labels
 
         # Smart content handling based on splitting preference
-        if allow_splitting:
+        if parsed.allow_splitting or self.force_split:
             # Use smart splitting that breaks content naturally at page boundaries
-            self._draw_content_with_smart_splitting(canvas, label, clean_text, style, wrap_width, line_height, is_list, is_paragraph, draw_line)
+            self._draw_content_with_smart_splitting(canvas, parsed, style, wrap_width, line_height, draw_line)
         else:
             # Use original keep-together logic
-            self._draw_content_keep_together(canvas, label, clean_text, style, wrap_width, line_height, is_list, is_paragraph, draw_line)
+            self._draw_content_keep_together(canvas, parsed, style, wrap_width, line_height, draw_line)
 
         # Restore original settings
         canvas.setFont(current_font, current_size)
         canvas.setFillColor(current_color)
 
-    def _draw_content_with_smart_splitting(self, canvas, original_label, clean_text, style, wrap_width, line_height, is_list, is_paragraph, draw_line):
+    def _draw_content_with_smart_splitting(self, canvas, parsed, style, wrap_width, line_height, draw_line):
         """Draw content with smart page break splitting"""
+        clean_text = parsed.text
+        is_list = parsed.is_list
+        is_paragraph = parsed.is_paragraph
         
         # Handle paragraph margins if applicable
         if (is_paragraph or is_list) and hasattr(style, 'paragraph_margin_top'):
@@ -246,7 +97,7 @@ class LabelManager:
                 import traceback
                 traceback.print_exc()
                 # Fallback to original method
-                self._draw_list_content(canvas, clean_text, style, wrap_width, line_height)
+                self._draw_list_content(canvas, parsed.items, style, wrap_width, line_height)
         else:
             try:
                 # Regular text wrapping for non-list content
@@ -276,45 +127,30 @@ class LabelManager:
         if not text:
             return
 
-        # Split into logical lines first (e.g., paragraphs)
-        paragraphs = text.split('\n')
-
-        lines_drawn = 0
-
-        for i, para in enumerate(paragraphs):
+        # One row per wrapped line; a blank line becomes a half-line gap (None)
+        rows = []
+        for para in text.split('\n'):
             para = para.strip()
             if not para:
-                self.generator.current_y -= line_height // 2
+                rows.append(None)
                 continue
+            rows.extend(_wrap_text(para, wrap_width, style.font_size, style.font_name))
 
-            wrapped_lines = _wrap_text(para, wrap_width, style.font_size, style.font_name)
-
-            for j, line in enumerate(wrapped_lines):
-                if self.generator.current_y - line_height < self.generator.margin_bottom:
-                    canvas.showPage()
-                    self.generator.current_page += 1
-                    self.generator.page_manager.initialize_page(canvas)
-                    canvas.setFont(style.font_name, style.font_size)
-                    canvas.setFillColor(style.color)
-
-                canvas.drawString(self.margin_x, self.generator.current_y, line)
-                self.generator.current_y -= line_height
-                lines_drawn += 1
-
-
-        if lines_drawn > 0:
-            self.generator.current_y -= style.spacing_after
-
+        self._draw_rows_with_widow_control(canvas, rows, line_height, style)
 
-    def _draw_content_keep_together(self, canvas, original_label, clean_text, style, wrap_width, line_height, is_list, is_paragraph, draw_line):
+    def _draw_content_keep_together(self, canvas, parsed, style, wrap_width, line_height, draw_line):
         """Draw content keeping it together (original behavior)"""
+        clean_text = parsed.text
+        is_list = parsed.is_list
+        is_paragraph = parsed.is_paragraph
+
         # Handle paragraph margins if applicable
         if (is_paragraph or is_list) and hasattr(style, 'paragraph_margin_top'):
             self.generator.current_y -= style.paragraph_margin_top
 
         # For lists, we need to handle each line separately to preserve bullet formatting
         if is_list:
-            self._draw_list_content(canvas, clean_text, style, wrap_width, line_height)
+            self._draw_list_content(canvas, parsed.items, style, wrap_width, line_height)
         else:
             # Regular text wrapping for non-list content
             wrapped_lines = _wrap_text(clean_text, wrap_width, style.font_size, style.font_name)
@@ -368,7 +204,7 @@ class LabelManager:
                     text_part = match.group(2)
                 
                 # Calculate indent for text after marker
-                marker_width = canvas.stringWidth(marker_part, style.font_name, style.font_size)
+                marker_width = string_width(marker_part, style.font_name, style.font_size)
                 text_indent = self.margin_x + marker_width
                 text_wrap_width = wrap_width - marker_width
                 
@@ -423,62 +259,106 @@ class LabelManager:
 
     def _draw_text_lines_with_splitting(self, canvas, wrapped_lines, line_height, style):
         """Draw regular text lines with smart page break splitting"""
+        rows = [line for line in wrapped_lines if line.strip()]
+        self._draw_rows_with_widow_control(canvas, rows, line_height, style)
+
+    def _draw_rows_with_widow_control(self, canvas, rows, line_height, style):
+        """Draw rows across pages, never leaving a lone first or last few lines.
+
+        A row is a line of text or None for a half-line gap. A page takes
+        nothing if fewer than PAGINATION['orphan_lines'] lines would fit on
+        it, and gives up lines so at least PAGINATION['widow_lines'] carry
+        over. An empty page always takes what fits, so long text still ends.
+        """
+        orphan_lines = PAGINATION['orphan_lines']
+        widow_lines = PAGINATION['widow_lines']
         lines_drawn = 0
-        
-        for line in wrapped_lines:
-            if line.strip():
-                # Check page break for each line
-                if self.generator.current_y - line_height < self.generator.margin_bottom:
-                    self._handle_page_break(canvas, style)
-                
-                canvas.drawString(self.margin_x, self.generator.current_y, line)
-                self.generator.current_y -= line_height
-                lines_drawn += 1
+        index = 0
+
+        while index < len(rows):
+            remaining = rows[index:]
+            fit = self._rows_that_fit(remaining, line_height)
+            at_page_top = self.generator.current_y >= self.generator.page_top_y
+
+            if fit < len(remaining):
+                take = fit
+                lines_left = sum(1 for row in remaining[take:] if row is not None)
+                while take > 0 and lines_left < widow_lines:
+                    take -= 1
+                    if remaining[take] is not None:
+                        lines_left += 1
+                lines_here = sum(1 for row in remaining[:take] if row is not None)
+                if lines_here < orphan_lines:
+                    take = 0
+                if take == 0 and at_page_top:
+                    # Nothing better is coming on an empty page
+                    take = max(fit, 1)
+                fit = take
+
+            # Runs of text rows between gaps go out as one text block
+            block = []
+            for row in remaining[:fit]:
+                if row is not None:
+                    block.append(row)
+                    continue
+                lines_drawn += self._draw_row_block(canvas, block, line_height)
+                block = []
+                self.generator.current_y -= line_height // 2
+            lines_drawn += self._draw_row_block(canvas, block, line_height)
+
+            index += fit
+            if index < len(rows):
+                self._handle_page_break(canvas, style)
 
         # Add spacing after text
         if lines_drawn > 0:
-            self.generator.current_y -= style.spacing_after 
+            self.generator.current_y -= style.spacing_after
+
+    def _draw_row_block(self, canvas, lines, line_height):
+        """Draw consecutive text rows as one text block; returns how many"""
+        if not lines:
+            return 0
+        if self.first_line_page is None:
+            self.first_line_page = canvas.getPageNumber()
+        canvas.drawTextLines(self.margin_x, self.generator.current_y, lines, line_height)
+        self.generator.current_y -= line_height * len(lines)
+        return len(lines)
+
+    def _rows_that_fit(self, rows, line_height):
+        """How many of rows fit above the bottom margin from the current position"""
+        y = self.generator.current_y
+        for count, row in enumerate(rows):
+            if row is None:
+                y -= line_height // 2
+                continue
+            if y - line_height < self.generator.margin_bottom:
+                return count
+            y -= line_height
+        return len(rows)
 
     def _handle_page_break(self, canvas, style):
         """Handle page break and restore styling"""
-        self.generator.current_page += 1
-        self.generator.page_manager.initialize_page(canvas)
+        self.generator.page_manager.new_page(canvas)
         # Reset font and color after page break
         canvas.setFont(style.font_name, style.font_size)
         canvas.setFillColor(style.color)
 
-    def _draw_list_content(self, canvas, text, style, wrap_width, line_height):
+    def _draw_list_content(self, canvas, items, style, wrap_width, line_height):
         """Draw list content with proper bullet point or numbered formatting"""
-        lines = text.split('\n')
         lines_drawn = 0
         
-        for line in lines:
-            line = line.strip()
-            if not line:
+        for marker_part, text_part in items:
+            if marker_part is None and not text_part:
                 # Empty line - add some spacing for paragraph breaks
                 self.generator.current_y -= line_height // 2
                 continue
                 
-            # Check if this is a list item (bullet or numbered)
-            is_bullet_item = line.startswith('•')
-            is_numbered_item = re.match(r'^\d+\.\s', line)
-            
-            if is_bullet_item or is_numbered_item:
-                # This is a list item
-                if is_bullet_item:
-                    marker_part = '• '
-                    text_part = line[2:].strip()  # Remove bullet and leading space
-                else:  # numbered item
-                    # Extract the number and period (e.g., "1. ")
-                    match = re.match(r'^(\d+\.\s)(.*)', line)
-                    marker_part = match.group(1)
-                    text_part = match.group(2)
-                
-                # Draw marker (bullet or number)
+            if marker_part is not None:
+                # This is a list item: draw marker (bullet or number)
                 canvas.drawString(self.margin_x, self.generator.current_y, marker_part)
                 
                 # Calculate indent for text after marker
-                marker_width = canvas.stringWidth(marker_part, style.font_name, style.font_size)
+                marker_width = string_width(marker_part, style.font_name, style.font_size)
                 text_indent = self.margin_x + marker_width
                 text_wrap_width = wrap_width - marker_width
                 
@@ -486,29 +366,22 @@ class LabelManager:
                 if text_part:
                     wrapped_text_lines = _wrap_text(text_part, text_wrap_width, style.font_size, style.font_name)
                     
-                    # Draw first line on same line as marker
+                    # First line sits beside the marker, continuation lines share its indent
                     if wrapped_text_lines:
-                        canvas.drawString(text_indent, self.generator.current_y, wrapped_text_lines[0])
-                        self.generator.current_y -= line_height
-                        lines_drawn += 1
-                        
-                        # Draw continuation lines with same indent
-                        for wrapped_line in wrapped_text_lines[1:]:
-                            canvas.drawString(text_indent, self.generator.current_y, wrapped_line)
-                            self.generator.current_y -= line_height
-                            lines_drawn += 1
+                        canvas.drawTextLines(text_indent, self.generator.current_y, wrapped_text_lines, line_height)
+                        self.generator.current_y -= line_height * len(wrapped_text_lines)
+                        lines_drawn += len(wrapped_text_lines)
                 else:
                     # Just marker, no text
                     self.generator.current_y -= line_height
                     lines_drawn += 1
             else:
                 # Regular paragraph text (not a list item)
-                wrapped_lines = _wrap_text(line, wrap_width, style.font_size, style.font_name)
-                for wrapped_line in wrapped_lines:
-                    if wrapped_line.strip():
-                        canvas.drawString(self.margin_x, self.generator.current_y, wrapped_line)
-                        self.generator.current_y -= line_height
-                        lines_drawn += 1
+                wrapped_lines = _wrap_text(text_part, wrap_width, style.font_size, style.font_name)
+                wrapped_lines = [line for line in wrapped_lines if line.strip()]
+                canvas.drawTextLines(self.margin_x, self.generator.current_y, wrapped_lines, line_height)
+                self.generator.current_y -= line_height * len(wrapped_lines)
+                lines_drawn += len(wrapped_lines)
 
         # Add spacing after list
         if lines_drawn > 0:
@@ -516,13 +389,11 @@ class LabelManager:
 
     def _draw_text_lines(self, canvas, wrapped_lines, line_height, tight=False):
         """Draw regular text lines"""
-        lines_drawn = 0
-        
-        for line in wrapped_lines:
-            if line.strip():
-                canvas.drawString(self.margin_x, self.generator.current_y, line)
-                self.generator.current_y -= line_height - (10 if tight else 0)
-                lines_drawn += 1
+        lines = [line for line in wrapped_lines if line.strip()]
+        step = line_height - (10 if tight else 0)
+        canvas.drawTextLines(self.margin_x, self.generator.current_y, lines, step)
+        self.generator.current_y -= step * len(lines)
+        lines_drawn = len(lines)
 
         # Add spacing after text
         if lines_drawn > 0 and not tight:
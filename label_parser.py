@@ -0,0 +1,344 @@
+# label_parser.py - Single-pass HTML label tokenizer with a parsed-label cache
+from functools import lru_cache
+
+# HTML flags detected in a label
+HTML_H1 = 1
+HTML_H3 = 2
+HTML_H4 = 4
+HTML_H5 = 8
+HTML_P = 16
+HTML_LIST = 32          # <ul>, <ol> or <li>
+HTML_SPLIT = 64         # data-split / data-splittable marker
+
+_FLAG_TAGS = {
+    '<h1>': HTML_H1,
+    '<h3>': HTML_H3,
+    '<h4>': HTML_H4,
+    '<h5>': HTML_H5,
+    '<p>': HTML_P,
+    '<ul>': HTML_LIST,
+    '<li>': HTML_LIST,
+    '<ol>': HTML_LIST,
+}
+
+# Stands in for an ordered list marker until the items are numbered
+_ITEM_MARK = object()
+
+# Parsed labels are kept for this many distinct label strings
+PARSED_LABEL_CACHE_SIZE = 1024
+
+
+class ParsedLabel:
+    """Everything label drawing needs from a label's HTML.
+
+    ``text`` is the label with links unwrapped, lists numbered or bulleted
+    and all other tags removed. ``items`` has one ``(marker, text)`` pair per
+    line of ``text``; ``marker`` is the bullet or number (e.g. ``'2. '``) of
+    a list item, or None for plain and blank lines.
+    """
+    __slots__ = ('flags', 'is_list', 'is_paragraph', 'allow_splitting', 'text', 'items')
+
+    def __init__(self, flags, is_paragraph, text):
+        self.flags = flags
+        self.is_list = bool(flags & HTML_LIST)
+        self.is_paragraph = is_paragraph
+        self.allow_splitting = bool(flags & HTML_SPLIT)
+        self.text = text
+        self.items = tuple(_split_marker(line.strip()) for line in text.split('\n'))
+
+    @property
+    def style_key(self):
+        """Label style used when this is a standalone 'label' field"""
+        flags = self.flags
+        if flags & HTML_H1:
+            return 'h1'
+        if flags & HTML_H3:
+            return 'h3'
+        if flags & HTML_H4:
+            return 'h4'
+        if flags & HTML_H5:
+            return 'h5'
+        if flags & HTML_LIST:
+            return 'ul'
+        if flags & HTML_P:
+            return 'p'
+        return 'regular'
+
+
+def _split_marker(line):
+    """Split a bullet ('• ') or number ('12. ') marker off a list line"""
+    if line.startswith('•'):
+        return '• ', line[2:].strip()
+
+    digits = 0
+    while digits < len(line) and line[digits].isdecimal():
+        digits += 1
+    if digits and line[digits:digits + 1] == '.' and line[digits + 1:digits + 2].isspace():
+        return line[:digits + 2], line[digits + 2:]
+    return None, line
+
+
+def _opens_tag(label, pos):
+    """Whether the '<' at pos starts a tag rather than being plain text"""
+    char = label[pos + 1:pos + 2]
+    return char in ('/', '!') or char.isalpha()
+
+
+def _tokenize(label):
+    """Split a label into text and tag tokens in one pass.
+
+    Tokens are ``(tag_key, raw)`` pairs; ``tag_key`` is None for text, or the
+    lowercased tag. A tag starts at a '<' followed by '/', '!' or a letter
+    and runs to the next '>' on the same line without another '<' in
+    between. Any other '<' (as in "x < y") stays in the text, so it can't
+    hide a real tag after it.
+    """
+    tokens = []
+    text_start = 0
+    pos = 0
+    while True:
+        start = label.find('<', pos)
+        if start < 0:
+            break
+        if not _opens_tag(label, start):
+            pos = start + 1
+            continue
+        end = label.find('>', start + 1)
+        if end < 0:
+            break
+        inner = label.find('<', start + 1, end)
+        if inner >= 0:
+            # This '<' was text; a tag may start at the inner one
+            pos = inner
+            continue
+        newline = label.find('\n', start + 1, end)
+        if newline >= 0:
+            # No '<' before this newline can close on this line
+            pos = newline + 1
+            continue
+
+        if start > text_start:
+            tokens.append((None, label[text_start:start]))
+        raw = label[start:end + 1]
+        tokens.append((raw.lower(), raw))
+        text_start = pos = end + 1
+
+    if text_start < len(label):
+        tokens.append((None, label[text_start:]))
+    return tokens
+
+
+def _unwrap_links(tokens):
+    """Drop <a ...> and its </a> so only the link text is left"""
+    closes = [index for index, (key, _) in enumerate(tokens) if key == '</a>']
+    if not closes:
+        return tokens
+
+    unwrapped = []
+    close_at = iter(closes)
+    next_close = next(close_at)
+    index = 0
+    while index < len(tokens):
+        key = tokens[index][0]
+        if key and key.startswith('<a') and next_close is not None:
+            while next_close is not None and next_close <= index:
+                next_close = next(close_at, None)
+            if next_close is not None:
+                unwrapped.extend(tokens[index + 1:next_close])
+                index = next_close + 1
+                continue
+        unwrapped.append(tokens[index])
+        index += 1
+    return unwrapped
+
+
+def _text_of(tokens):
+    return ''.join(raw for key, raw in tokens if key is None)
+
+
+def _structured_lists(tokens):
+    """Find <ol>/<ul> blocks, each ending at the first close of its own type.
+
+    Returns a list of (open_index, close_index, kind), or an empty list.
+    """
+    last_close = {'ol': -1, 'ul': -1}
+    for index, (key, _) in enumerate(tokens):
+        if key == '</ol>':
+            last_close['ol'] = index
+        elif key == '</ul>':
+            last_close['ul'] = index
+
+    blocks = []
+    index = 0
+    while index < len(tokens):
+        key = tokens[index][0]
+        kind = key[1:3] if key and key[0] == '<' else None
+        if kind in last_close and last_close[kind] > index:
+            close_key = '</' + kind + '>'
+            close = index + 1
+            while tokens[close][0] != close_key:
+                close += 1
+            blocks.append((index, close, kind))
+            index = close
+        index += 1
+    return blocks
+
+
+def _letter_style(tokens):
+    """'a' or 'A' for an ordered list with a letter type attribute, else None"""
+    for _, raw in tokens:
+        lowered = raw.lower()
+        pos = lowered.find('type=')
+        while pos >= 0:
+            quote, letter, closing = raw[pos + 5:pos + 6], raw[pos + 6:pos + 7], raw[pos + 7:pos + 8]
+            if quote in ('"', "'") and closing in ('"', "'") and letter in ('a', 'A'):
+                return letter
+            pos = lowered.find('type=', pos + 1)
+    return None
+
+
+def _list_block_lines(tokens, kind):
+    """Numbered, lettered or bulleted lines for one list block"""
+    letter = _letter_style(tokens) if kind == 'ol' else None
+    lines = []
+    counter = 1
+    index = 0
+    while index < len(tokens):
+        key = tokens[index][0]
+        if not (key and key.startswith('<li')):
+            index += 1
+            continue
+
+        close = index + 1
+        while close < len(tokens) and tokens[close][0] != '</li>':
+            close += 1
+        if close == len(tokens):
+            break
+
+        content = _text_of(tokens[index + 1:close]).strip()
+        if content:
+            if kind == 'ul':
+                lines.append(f"• {content}")
+            elif letter:
+                marker = chr(ord('a') + counter - 1)
+                lines.append(f"{marker.upper() if letter == 'A' else marker}. {content}")
+                counter += 1
+            else:
+                lines.append(f"{counter}. {content}")
+                counter += 1
+        index = close + 1
+    return lines
+
+
+def _structured_text(tokens, blocks):
+    lines = []
+    position = 0
+    for open_index, close_index, kind in blocks + [(len(tokens), None, None)]:
+        # Text between lists keeps its own line breaks
+        between = _text_of(tokens[position:open_index]).strip()
+        if between:
+            lines.extend(between.split('\n'))
+        if kind is None:
+            break
+        lines.extend(_list_block_lines(tokens[open_index:close_index + 1], kind))
+        position = close_index + 1
+    return '\n'.join(lines)
+
+
+def _simple_list_text(tokens, is_ordered):
+    """Loose <li> items outside a complete <ol>/<ul> block, one per line"""
+    item_start = [_ITEM_MARK] if is_ordered else ['• ']
+    pieces = []
+    for key, raw in tokens:
+        if key is None:
+            pieces.append(raw)
+        elif key.startswith('<li'):
+            pieces.append('\n')
+            pieces.extend(item_start)
+        elif key.startswith(('<ul', '<ol', '</ul', '</ol')):
+            pieces.append('\n')
+        elif key.startswith('<p'):
+            pieces.append('\n\n')
+        elif key not in ('</p>', '</li>'):
+            # Other tags are dropped, but still count when trimming a line
+            pieces.append(None)
+
+    lines = []
+    line = []
+    for piece in pieces:
+        if isinstance(piece, str) and '\n' in piece:
+            parts = piece.split('\n')
+            line.append(parts[0])
+            lines.append(line)
+            lines.extend([part] for part in parts[1:-1])
+            line = [parts[-1]]
+        else:
+            line.append(piece)
+    lines.append(line)
+
+    result = []
+    counter = 1
+    for line in lines:
+        line = _trim_line(line)
+        if not line:
+            continue
+        prefix = ''
+        if line[0] is _ITEM_MARK:
+            prefix = f"{counter}. "
+            counter += 1
+            line = line[1:]
+        result.append(prefix + ''.join(piece for piece in line if isinstance(piece, str)))
+    return '\n'.join(result)
+
+
+def _trim_line(line):
+    """Strip surrounding whitespace from a line of pieces, stopping at tags"""
+    line = [piece for piece in line if piece != '']
+    while line and isinstance(line[0], str):
+        stripped = line[0].lstrip()
+        if stripped:
+            line[0] = stripped
+            break
+        line.pop(0)
+    while line and isinstance(line[-1], str):
+        stripped = line[-1].rstrip()
+        if stripped:
+            line[-1] = stripped
+            break
+        line.pop()
+    return line
+
+
+@lru_cache(maxsize=PARSED_LABEL_CACHE_SIZE)
+def parse_label(label):
+    """Parse a label's HTML once; repeated labels come from the cache"""
+    tokens = _tokenize(label or '')
+
+    flags = 0
+    has_paragraph_close = False
+    is_ordered = False
+    for key, raw in tokens:
+        if 'data-split="true"' in raw or 'data-splittable="true"' in raw:
+            flags |= HTML_SPLIT
+        if key is None:
+            if '<' in raw and '<ol ' in raw.lower():
+                is_ordered = True
+            continue
+        flags |= _FLAG_TAGS.get(key, 0)
+        if key == '</p>':
+            has_paragraph_close = True
+        elif key == '<ol>' or key.startswith('<ol '):
+            is_ordered = True
+
+    tokens = _unwrap_links(tokens)
+    if flags & HTML_LIST:
+        blocks = _structured_lists(tokens)
+        if blocks:
+            text = _structured_text(tokens, blocks)
+        else:
+            text = _simple_list_text(tokens, is_ordered)
+    else:
+        text = _text_of(tokens)
+
+    is_paragraph = bool(flags & HTML_P) and has_paragraph_close and not flags & HTML_LIST
+    return ParsedLabel(flags, is_paragraph, text)
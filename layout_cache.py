@@ -0,0 +1,195 @@
+# layout_cache.py - Two-tier cache of LayoutPlans keyed by form content
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from reportlab import Version as REPORTLAB_VERSION
+from reportlab.lib import colors
+
+from constants import (
+    VERSION,
+    MARGINS,
+    PAGINATION,
+    FIELD_DIMENSIONS,
+    BUSINESS_INFO,
+    LOGO_BOX,
+    GROUP_CONFIGS,
+    FULL_WIDTH_FIELDS
+)
+from label_styles import LABEL_STYLES, LabelStyle
+from env import get_layout_cache_dir
+
+PLAN_SUFFIX = '.plan'
+
+
+def _canonical_default(obj):
+    """JSON fallback for the non-JSON values found in the layout settings"""
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if isinstance(obj, LabelStyle):
+        return vars(obj)
+    if isinstance(obj, colors.Color):
+        return list(obj.rgba())
+    raise TypeError(f"Cannot hash {type(obj).__name__} in layout cache key")
+
+
+def _canonical_json(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False, default=_canonical_default)
+
+
+# Everything except the form itself only changes with a deploy, so it is
+# hashed once per process
+_SETTINGS_DIGEST = hashlib.sha256(_canonical_json({
+    'version': VERSION,
+    'reportlab': REPORTLAB_VERSION,
+    'margins': MARGINS,
+    'pagination': PAGINATION,
+    'field_dimensions': FIELD_DIMENSIONS,
+    'business_info': BUSINESS_INFO,
+    'logo_box': LOGO_BOX,
+    'group_configs': GROUP_CONFIGS,
+    'label_styles': LABEL_STYLES,
+    'full_width_fields': FULL_WIDTH_FIELDS,
+}).encode('utf-8')).hexdigest()
+
+
+def layout_cache_key(form_json, extra=None):
+    """Canonical hash of a form definition plus all layout settings"""
+    digest = hashlib.sha256(_SETTINGS_DIGEST.encode('ascii'))
+    digest.update(_canonical_json(form_json).encode('utf-8'))
+    if extra is not None:
+        digest.update(_canonical_json(extra).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """In-process LRU of LayoutPlans backed by an optional on-disk tier.
+
+    The disk tier stores one pickled plan per key and evicts the least
+    recently used files once the directory grows past ``max_disk_bytes``.
+    Only point it at a directory you trust, since entries are unpickled.
+    """
+    def __init__(self, max_entries=128, cache_dir=None, max_disk_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, key):
+        plan = self._entries.get(key)
+        if plan is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return plan
+
+        plan = self._load_from_disk(key)
+        if plan is not None:
+            self._remember(key, plan)
+            self.disk_hits += 1
+            return plan
+
+        self.misses += 1
+        return None
+
+    def put(self, key, plan):
+        self._remember(key, plan)
+        if self.cache_dir:
+            self._save_to_disk(key, plan)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses
+        }
+
+    def _remember(self, key, plan):
+        self._entries[key] = plan
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ---------- disk tier ----------
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + PLAN_SUFFIX)
+
+    def _load_from_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                plan = pickle.load(f)
+            # Touch so size-based eviction drops the least recently used plans
+            os.utime(path)
+            return plan
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable layout cache entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _save_to_disk(self, key, plan):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(plan, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Could not write layout cache entry: {e}")
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(PLAN_SUFFIX):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+_default_cache = None
+
+
+def get_default_layout_cache():
+    """Process-wide cache; the disk tier is enabled by LAYOUT_CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LayoutCache(cache_dir=get_layout_cache_dir())
+    return _default_cache
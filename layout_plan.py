@@ -0,0 +1,385 @@
+# layout_plan.py - Canvas-independent layout output and its renderer
+import inspect
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.pdfbase.acroform import AcroForm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Keyword arguments accepted by each ReportLab widget call, so the recorder
+# rejects exactly what the real canvas would reject
+_WIDGET_SIGNATURES = {
+    kind: inspect.signature(getattr(AcroForm, kind))
+    for kind in ('textfield', 'checkbox', 'radio')
+}
+
+
+class LayoutPlan:
+    """Plain-data result of laying out a form.
+
+    Each page is a list of drawing operations stored as tuples:
+    ``(canvas_method, *args)`` for text runs, lines and state changes, and
+    ``('widget', kind, kwargs)`` for AcroForm widget rects and
+    ``('drawTextLines', x, y, leading, lines)`` for a block of text lines. ``forms`` holds
+    named form XObjects as ``name -> (bbox, ops)``. ``elided_ops`` counts
+    state changes the recorder dropped because they changed nothing. A
+    page handed out while recording without keep_pages is left as None.
+    """
+    elided_ops = 0
+
+    def __init__(self, page_width, page_height, title=None):
+        self.page_width = page_width
+        self.page_height = page_height
+        self.title = title
+        self.pages = [[]]
+        self.forms = {}
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    def widgets(self):
+        """Yield (page_index, kind, kwargs) for every widget in the plan"""
+        for page_index, ops in enumerate(self.pages):
+            for op in ops:
+                if op[0] == 'widget':
+                    yield page_index, op[1], op[2]
+
+
+class _WidgetRecorder:
+    """Stands in for canvas.acroForm and records widget calls"""
+    def __init__(self, layout_canvas):
+        self._canvas = layout_canvas
+
+    def _record(self, kind, kwargs):
+        # Raise TypeError on unsupported arguments, just like ReportLab
+        _WIDGET_SIGNATURES[kind].bind(None, **kwargs)
+        self._canvas._ops.append(('widget', kind, dict(kwargs)))
+
+    def textfield(self, **kwargs):
+        self._record('textfield', kwargs)
+
+    def checkbox(self, **kwargs):
+        self._record('checkbox', kwargs)
+
+    def radio(self, **kwargs):
+        self._record('radio', kwargs)
+
+
+def _color_key(color, alpha):
+    if isinstance(color, str):
+        color = colors.toColor(color)
+    return (type(color).__name__, repr(color), alpha)
+
+
+class LayoutCanvas:
+    """Records the subset of the ReportLab canvas API used by the layout code.
+
+    Graphics state (font, fill colour) is tracked the same way the real
+    canvas tracks it, so field classes can save and restore it unchanged.
+
+    State changes (font, colours, line width) are held back until something
+    is drawn, and only the ones that differ from what the content stream
+    already has are written. Changes that are overwritten or undone before
+    anything is drawn, like the save-then-restore pattern the field classes
+    use around every draw, never reach the stream; ``plan.elided_ops``
+    counts them.
+
+    With ``on_page``, each page is passed to ``on_page(ops)`` once
+    finish_pages() says it can no longer change, so it can be rendered
+    while later pages are still being laid out. Without ``keep_pages`` the
+    plan drops it after that.
+    """
+    def __init__(self, plan, initial_font='Helvetica', initial_size=12,
+                 on_page=None, keep_pages=True):
+        self.plan = plan
+        self.acroForm = _WidgetRecorder(self)
+        self.on_page = on_page
+        self.keep_pages = keep_pages
+        self._pages_out = 0
+        self._initial_font = initial_font
+        self._initial_size = initial_size
+        self._state_stack = []
+        self._form_stack = []
+        self._ops = plan.pages[-1]
+        self._init_graphics_state()
+        self._init_emitted_state()
+
+    def _init_graphics_state(self):
+        self._fontname = self._initial_font
+        self._fontsize = self._initial_size
+        self._fillColorObj = self._strokeColorObj = rl_config.canvas_baseColor or (0, 0, 0)
+        self._lineWidth = 1
+
+    def _init_emitted_state(self):
+        # Written state by kind ('font', 'fill', ...); a missing kind is
+        # unknown. Each page starts with the initial font from the preamble.
+        leading = self._initial_size * 1.2
+        self._emitted = {'font': (self._initial_font, self._initial_size, leading)}
+        self._emitted_stack = []
+        self._pending = {}
+
+    def _emit_state(self, kind, value, op):
+        """Hold a state change until the next drawing operation"""
+        # Counted as elided until _flush_state() actually writes it
+        self.plan.elided_ops += 1
+        self._pending[kind] = (value, op)
+
+    def _flush_state(self):
+        """Write pending state changes that differ from the stream's state"""
+        for kind, (value, op) in self._pending.items():
+            if self._emitted.get(kind) != value:
+                self._emitted[kind] = value
+                self._ops.append(op)
+                self.plan.elided_ops -= 1
+        self._pending = {}
+
+    def _get_state(self):
+        return (self._fontname, self._fontsize, self._fillColorObj,
+                self._strokeColorObj, self._lineWidth)
+
+    def _set_state(self, state):
+        (self._fontname, self._fontsize, self._fillColorObj,
+         self._strokeColorObj, self._lineWidth) = state
+
+    # ---------- pages and forms ----------
+
+    def getPageNumber(self):
+        return len(self.plan.pages)
+
+    def showPage(self):
+        self._ops = []
+        self.plan.pages.append(self._ops)
+        self._state_stack = []
+        self._init_graphics_state()
+        self._init_emitted_state()
+
+    def finish_pages(self, count):
+        """The first count pages are final: hand the new ones to on_page"""
+        if self.on_page is None:
+            return
+        pages = self.plan.pages
+        while self._pages_out < count:
+            ops = pages[self._pages_out]
+            if not self.keep_pages:
+                pages[self._pages_out] = None
+            self._pages_out += 1
+            self.on_page(ops)
+
+    def beginForm(self, name, lowerx=0, lowery=0, upperx=None, uppery=None):
+        self._form_stack.append((self._ops, self._get_state(), self._emitted,
+                                 self._emitted_stack, self._pending))
+        self._init_graphics_state()
+        # A form runs in whatever state it is drawn in
+        self._emitted = {}
+        self._emitted_stack = []
+        self._pending = {}
+        self._ops = []
+        self.plan.forms[name] = ((lowerx, lowery, upperx, uppery), self._ops)
+
+    def endForm(self):
+        self._ops, state, self._emitted, self._emitted_stack, self._pending = self._form_stack.pop()
+        self._set_state(state)
+
+    def doForm(self, name):
+        self._flush_state()
+        self._ops.append(('doForm', name))
+
+    def setTitle(self, title):
+        self.plan.title = title
+
+    # ---------- tentative layout ----------
+
+    def checkpoint(self):
+        """Mark the current position so tentative drawing can be undone"""
+        return (len(self.plan.pages), len(self._ops), self._get_state(), list(self._state_stack),
+                dict(self._emitted), list(self._emitted_stack), dict(self._pending),
+                self.plan.elided_ops)
+
+    def rollback(self, mark):
+        """Drop everything drawn since checkpoint(), including new pages.
+
+        Pages already handed out by finish_pages() can't be rolled back.
+        """
+        (page_count, op_count, state, state_stack,
+         emitted, emitted_stack, pending, elided_ops) = mark
+        del self.plan.pages[page_count:]
+        self._ops = self.plan.pages[-1]
+        del self._ops[op_count:]
+        self._set_state(state)
+        self._state_stack = list(state_stack)
+        self._emitted = dict(emitted)
+        self._emitted_stack = list(emitted_stack)
+        self._pending = dict(pending)
+        self.plan.elided_ops = elided_ops
+
+    def _content_extents(self, mark):
+        """(top, bottom) y of everything drawn on the current page since checkpoint()"""
+        page_count, op_count = mark[0], mark[1]
+        ops = self._ops[op_count:] if len(self.plan.pages) == page_count else self._ops
+        for op in ops:
+            name = op[0]
+            if name == 'drawString':
+                yield op[2], op[2]
+            elif name == 'drawTextLines':
+                yield op[2], op[2] - op[3] * (len(op[4]) - 1)
+            elif name == 'line':
+                yield max(op[2], op[4]), min(op[2], op[4])
+            elif name == 'widget':
+                y = op[2].get('y')
+                if y is not None:
+                    yield y + op[2].get('height', op[2].get('size', 0)), y
+
+    def content_bottom(self, mark):
+        """Lowest y drawn on the current page since checkpoint(), or None.
+
+        Text counts from its baseline and widgets and lines from their
+        lowest edge.
+        """
+        return min((bottom for _, bottom in self._content_extents(mark)), default=None)
+
+    def content_top(self, mark):
+        """Highest y drawn on the current page since checkpoint(), or None.
+
+        Text counts from its baseline and widgets and lines from their
+        top edge.
+        """
+        return max((top for top, _ in self._content_extents(mark)), default=None)
+
+    def close(self):
+        """Finish recording and return the plan"""
+        # ReportLab's save() skips a trailing page with nothing on it
+        if len(self.plan.pages) > 1 and not self.plan.pages[-1]:
+            self.plan.pages.pop()
+        self.finish_pages(len(self.plan.pages))
+        return self.plan
+
+    # ---------- graphics state ----------
+
+    def saveState(self):
+        # q saves the state in effect, so it has to be written first
+        self._flush_state()
+        self._state_stack.append(self._get_state())
+        self._emitted_stack.append(dict(self._emitted))
+        self._ops.append(('saveState',))
+
+    def restoreState(self):
+        self._set_state(self._state_stack.pop())
+        self._emitted = self._emitted_stack.pop()
+        self._pending = {}
+        self._ops.append(('restoreState',))
+
+    def translate(self, dx, dy):
+        self._ops.append(('translate', dx, dy))
+
+    def setFont(self, psfontname, size, leading=None):
+        self._fontname = psfontname
+        self._fontsize = size
+        written = (psfontname, size, size * 1.2 if leading is None else leading)
+        self._emit_state('font', written, ('setFont', psfontname, size, leading))
+
+    def setFillColor(self, aColor, alpha=None):
+        self._fillColorObj = colors.toColor(aColor) if isinstance(aColor, str) else aColor
+        self._emit_state('fill', _color_key(aColor, alpha), ('setFillColor', aColor, alpha))
+
+    def setFillColorRGB(self, r, g, b, alpha=None):
+        self._fillColorObj = (r, g, b)
+        self._emit_state('fill', ('rgb', (r, g, b), alpha), ('setFillColorRGB', r, g, b, alpha))
+
+    def setStrokeColor(self, aColor, alpha=None):
+        self._strokeColorObj = colors.toColor(aColor) if isinstance(aColor, str) else aColor
+        self._emit_state('stroke', _color_key(aColor, alpha), ('setStrokeColor', aColor, alpha))
+
+    def setStrokeColorRGB(self, r, g, b, alpha=None):
+        self._strokeColorObj = (r, g, b)
+        self._emit_state('stroke', ('rgb', (r, g, b), alpha), ('setStrokeColorRGB', r, g, b, alpha))
+
+    def setLineWidth(self, width):
+        self._lineWidth = width
+        self._emit_state('line_width', width, ('setLineWidth', width))
+
+    # ---------- drawing ----------
+
+    def drawString(self, x, y, text):
+        self._flush_state()
+        self._ops.append(('drawString', x, y, text))
+
+    def drawTextLines(self, x, y, lines, leading):
+        """Draw lines downward from baseline y, leading apart, as one text object"""
+        if not lines:
+            return
+        self._flush_state()
+        self._ops.append(('drawTextLines', x, y, leading, tuple(lines)))
+
+    def line(self, x1, y1, x2, y2):
+        self._flush_state()
+        self._ops.append(('line', x1, y1, x2, y2))
+
+    def drawImage(self, image, x, y, width=None, height=None, mask=None):
+        self._flush_state()
+        self._ops.append(('drawImage', image, x, y, width, height, mask))
+
+    def stringWidth(self, text, fontName=None, fontSize=None):
+        return stringWidth(text, fontName or self._fontname,
+                           fontSize if fontSize is not None else self._fontsize)
+
+
+def draw_text_lines(c, x, y, leading, lines):
+    """Write lines to a ReportLab canvas as one BT/ET block moved by TL/T*"""
+    if len(lines) == 1:
+        # A lone line needs no leading
+        c.drawString(x, y, lines[0])
+        return
+    text = c.beginText(x, y)
+    text.setLeading(leading)
+    for line in lines:
+        text.textLine(line)
+    c.drawText(text)
+
+
+def _replay(c, ops):
+    for op in ops:
+        if op[0] == 'widget':
+            getattr(c.acroForm, op[1])(**op[2])
+        elif op[0] == 'drawTextLines':
+            draw_text_lines(c, *op[1:])
+        else:
+            getattr(c, op[0])(*op[1:])
+
+
+def render_plan(plan, c):
+    """Replay a LayoutPlan onto a real ReportLab canvas"""
+    for ops in plan.pages:
+        render_page(c, ops)
+    render_forms(plan, c)
+
+
+def render_page(c, ops):
+    """Replay one page of a LayoutPlan and finish it"""
+    _replay(c, ops)
+    c.showPage()
+
+
+def render_forms(plan, c):
+    """Set the title and define the plan's form XObjects, after its pages"""
+    if plan.title:
+        c.setTitle(plan.title)
+
+    # Forms may be referenced before they are defined; ReportLab resolves
+    # them at save time
+    for name, (bbox, ops) in plan.forms.items():
+        define_form(c, name, bbox, ops)
+
+
+def record_ops(draw, page_width, page_height):
+    """Run draw(canvas) against a recorder and return its ops as a tuple"""
+    plan = LayoutPlan(page_width, page_height)
+    draw(LayoutCanvas(plan))
+    return tuple(plan.pages[0])
+
+
+def define_form(c, name, bbox, ops):
+    """Define form XObject name on c from recorded ops"""
+    c.beginForm(name, *bbox)
+    _replay(c, ops)
+    c.endForm()
@@ -0,0 +1,82 @@
+# object_streams.py - Compact PDF output: object streams plus an xref stream
+import re
+import zlib
+
+from pdf_objects import PDFFile, PDFParseError, xref_stream
+
+_STREAM_RE = re.compile(rb'>>\s*stream(\r\n|\n|\r)')
+
+# Objects packed per object stream; readers inflate a whole stream to
+# reach any object in it, so keep them small enough to stay cheap
+OBJECTS_PER_STREAM = 100
+
+# Object streams and xref streams need PDF 1.5
+COMPACT_HEADER = b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n'
+
+
+def _is_stream(body):
+    return _STREAM_RE.search(body) is not None
+
+
+def _object_stream(bodies, level):
+    """Body of an object stream holding [(num, body), ...]"""
+    header = []
+    content = []
+    offset = 0
+    for num, body in bodies:
+        header.append(b'%d %d' % (num, offset))
+        content.append(body)
+        offset += len(body) + 1
+    header = b' '.join(header) + b'\n'
+    data = zlib.compress(header + b'\n'.join(content) + b'\n', level)
+    return (b'<<\n/Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d\n>>\nstream\n'
+            % (len(bodies), len(header), len(data))) + data + b'\nendstream'
+
+
+def compact_pdf(data, level=6, objects_per_stream=OBJECTS_PER_STREAM):
+    """Rewrite a finished PDF with object streams and a cross-reference stream.
+
+    Every non-stream object (widget and field dictionaries, fonts, pages)
+    is packed into deflated object streams; stream objects such as page
+    content and appearance streams are copied as they are. The classic
+    xref table is replaced by a compressed xref stream. Returns the new
+    file as bytes; incremental updates in ``data`` are folded in.
+    """
+    pdf = PDFFile(data)
+    if b'/Encrypt' in pdf.trailer:
+        raise PDFParseError("encrypted files can't be compacted")
+
+    out = [COMPACT_HEADER]
+    pos = len(COMPACT_HEADER)
+    entries = {0: (0, 0, 65535)}
+    packed = []
+
+    for num, body in pdf.iter_objects():
+        if not _is_stream(body):
+            packed.append((num, body))
+            continue
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (num, body)
+        entries[num] = (1, pos, 0)
+        out.append(chunk)
+        pos += len(chunk)
+
+    next_num = max(entries.keys() | {num for num, _ in packed}) + 1
+    for start in range(0, len(packed), objects_per_stream):
+        group = packed[start:start + objects_per_stream]
+        for index, (num, _) in enumerate(group):
+            entries[num] = (2, next_num, index)
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (next_num, _object_stream(group, level))
+        entries[next_num] = (1, pos, 0)
+        out.append(chunk)
+        pos += len(chunk)
+        next_num += 1
+
+    trailer = {'Size': b'%d' % (next_num + 1), 'Root': b'%d 0 R' % pdf.root}
+    if pdf.info:
+        trailer['Info'] = b'%d 0 R' % pdf.info
+    if pdf.ids:
+        trailer['ID'] = b'[%s%s]' % pdf.ids
+    entries[next_num] = (1, pos, 0)
+    out.append(b'%d 0 obj\n%s\nendobj\n' % (next_num, xref_stream(entries, trailer, level)))
+    out.append(b'startxref\n%d\n%%%%EOF\n' % pos)
+    return b''.join(out)
@@ -0,0 +1,54 @@
+# page_compression.py - Deflate page content streams on a thread pool
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from reportlab.pdfbase import pdfdoc
+
+# Pages smaller than this are compressed inline; a thread hop costs more
+PARALLEL_MIN_BYTES = 64 * 1024
+
+
+def _page_bytes(page):
+    stream = page.stream
+    return stream.encode('utf8') if isinstance(stream, str) else stream
+
+
+def _flate_stream(data, level):
+    stream = pdfdoc.PDFStream(content=zlib.compress(data, level))
+    # A Filter entry tells ReportLab the content is already encoded
+    stream.dictionary['Filter'] = pdfdoc.PDFArray([pdfdoc.PDFName('FlateDecode')])
+    stream.__Comment__ = "page stream"
+    return stream
+
+
+def compress_page(page, level=6):
+    """Deflate one finished page's content stream, e.g. while streaming output"""
+    page.Contents = _flate_stream(_page_bytes(page), level)
+    return page.Contents
+
+
+def compress_page_streams(c, level=6, workers=None):
+    """Deflate every finished page of canvas c before c.save().
+
+    Call after the last showPage(). zlib releases the GIL, so large pages
+    are compressed in parallel; pages that already have their Contents
+    set are left alone. Returns (raw_bytes, compressed_bytes).
+    """
+    pages = [page for page in c._doc.Pages.pages if not page.Contents and page.stream]
+    if not pages:
+        return 0, 0
+
+    data = [_page_bytes(page) for page in pages]
+    total = sum(len(chunk) for chunk in data)
+    workers = workers or min(len(pages), os.cpu_count() or 1)
+
+    if workers > 1 and total >= PARALLEL_MIN_BYTES:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            streams = list(pool.map(lambda chunk: _flate_stream(chunk, level), data))
+    else:
+        streams = [_flate_stream(chunk, level) for chunk in data]
+
+    for page, stream in zip(pages, streams):
+        page.Contents = stream
+    return total, sum(len(stream.content) for stream in streams)
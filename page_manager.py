@@ -1,5 +1,19 @@
 # page_manager.py - HEADER ONLY ON FIRST PAGE
-from utils import _prepare_logo_image
+from text_metrics import string_width
+from layout_plan import record_ops, define_form
+from image_cache import load_image
+from constants import LOGO_BOX
+
+# Name of the form XObject holding the total page count. Every page footer
+# references it and it is only defined once the last page is known.
+PAGE_TOTAL_FORM = 'page_total'
+
+# Name of the form XObject holding the business header
+BUSINESS_HEADER_FORM = 'business_header'
+
+# Recorded header drawings, keyed by everything that changes how they look.
+# Each one is drawn once per process and only replayed into later documents.
+_header_forms = {}
 
 class PageManager:
     def __init__(self, generator):
@@ -11,48 +25,129 @@ class PageManager:
 
     def initialize_page(self, canvas):
         """Initialize a new page with conditional header"""
-        # Reset Y position to top of page
-        self.generator.current_y = self.page_height - self.margin_x
-        
         # Only draw business header on first page
         if self.generator.current_page == 1:
             self._draw_clean_business_header(canvas)
+
+        # Where content starts, so the paginator can tell an empty page
+        self.generator.current_y = self.content_top(self.generator.current_page)
+        self.generator.page_top_y = self.generator.current_y
+
+        self._draw_page_footer(canvas)
+        # Anything drawn after this is page content
+        self.generator.page_start = canvas.checkpoint()
+
+    def content_top(self, page_number):
+        """y where content starts on a page"""
+        if page_number == 1:
             # More space after business header on first page
-            self.generator.current_y -= 35
-        else:
-            # Less space from top on subsequent pages
-            self.generator.current_y -= 15
+            return self.page_height - self.margin_x - 35
+        # Less space from top on subsequent pages
+        return self.page_height - self.margin_x - 15
 
-    def _draw_clean_business_header(self, canvas):
-        """Draw clean, professional business header (first page only)"""
+    def new_page(self, canvas):
+        """Finish the current page and start the next one"""
+        canvas.showPage()
+        self.generator.current_page += 1
+        self.initialize_page(canvas)
+
+    def _draw_page_footer(self, canvas):
+        """Draw "Page X of Y" footer; Y is deferred until finish_document()"""
         current_font = canvas._fontname
         current_size = canvas._fontsize
         current_color = canvas._fillColorObj
-        
+
+        prefix = f"Page {canvas.getPageNumber()} of "
+        prefix_width = string_width(prefix, "Helvetica", 8)
+        footer_x = (self.page_width - prefix_width) / 2
+        footer_y = self.generator.margin_bottom / 2
+
+        canvas.setFont("Helvetica", 8)
+        canvas.setFillColor(self.colors['secondary'])
+        canvas.drawString(footer_x, footer_y, prefix)
+
+        # Page total is filled in at save time through a shared form XObject
+        canvas.saveState()
+        canvas.translate(footer_x + prefix_width, footer_y)
+        canvas.doForm(PAGE_TOTAL_FORM)
+        canvas.restoreState()
+
+        canvas.setFont(current_font, current_size)
+        canvas.setFillColor(current_color)
+
+    def finish_document(self, canvas):
+        """Define deferred page content once all pages have been drawn"""
+        total_pages = canvas.getPageNumber()
+
+        canvas.beginForm(PAGE_TOTAL_FORM)
+        canvas.setFont("Helvetica", 8)
+        canvas.setFillColor(self.colors['secondary'])
+        canvas.drawString(0, 0, str(total_pages))
+        canvas.endForm()
+
+        bbox, ops = self._business_header_form()
+        define_form(canvas, BUSINESS_HEADER_FORM, bbox, ops)
+
+    def _draw_clean_business_header(self, canvas):
+        """Place the business header (first page only)"""
+        # The header is drawn in page coordinates, so it goes at the origin.
+        # Do saves and restores graphics state, so nothing needs resetting.
+        canvas.doForm(BUSINESS_HEADER_FORM)
+
+    def _business_header_form(self):
+        """(bbox, ops) of the header form, recorded once per process"""
+        logo = self._header_logo()
+        key = (
+            logo.source_key if logo else None,
+            self.generator.business_name,
+            self.generator.phone,
+            self.generator.email,
+            self.generator.address,
+            self.page_width,
+            self.page_height,
+            self.margin_x,
+            tuple(self.colors['primary'].rgba()),
+            tuple(self.colors['border'].rgba())
+        )
+        form = _header_forms.get(key)
+        if form is None:
+            bbox = (0, 0, self.page_width, self.page_height)
+            draw = lambda canvas: self._draw_header_content(canvas, logo)
+            form = (bbox, record_ops(draw, self.page_width, self.page_height))
+            _header_forms[key] = form
+        return form
+
+    def _header_logo(self):
+        return load_image(self.generator.logo_path, LOGO_BOX['max_width'], LOGO_BOX['max_height'])
+
+    def _draw_header_content(self, canvas, logo=None):
+        """Draw clean, professional business header"""
         # Header positioning
         header_y = self.page_height - 25
+        text_x = self.margin_x
+
+        # Logo sits left of the business name, between the name and the rule
+        if logo is not None:
+            canvas.drawImage(logo, self.margin_x, header_y - 15, logo.width, logo.height, mask='auto')
+            text_x += logo.width + 8
         
         # Business name and contact info on same line
         canvas.setFont("Helvetica-Bold", 11)
         canvas.setFillColor(self.colors['primary'])
-        canvas.drawString(self.margin_x, header_y, self.generator.business_name)
+        canvas.drawString(text_x, header_y, self.generator.business_name)
         
         # Contact info on same line, right-aligned
         canvas.setFont("Helvetica", 9)
         contact_info = f"{self.generator.phone} • {self.generator.email}"
-        text_width = canvas.stringWidth(contact_info, "Helvetica", 9)
+        text_width = string_width(contact_info, "Helvetica", 9)
         canvas.drawString(self.page_width - self.margin_x - text_width, header_y, contact_info)
         
         # Address on second line
         canvas.setFont("Helvetica", 9)
-        canvas.drawString(self.margin_x, header_y - 12, self.generator.address)
+        canvas.drawString(text_x, header_y - 12, self.generator.address)
         
         # Optional: Add a subtle line under the header
         canvas.setStrokeColor(self.colors['border'])
         canvas.setLineWidth(0.5)
         canvas.line(self.margin_x, header_y - 18, 
                    self.page_width - self.margin_x, header_y - 18)
-        
-        # Restore original font settings
-        canvas.setFont(current_font, current_size)
-        canvas.setFillColor(current_color)
\ No newline at end of file
@@ -0,0 +1,233 @@
+# paginator.py - Places fields on pages from their measured layout
+from field_spec import SUBMISSION_TYPES, HTML_SPLIT
+
+# Fields that only change group state and draw nothing
+GROUP_CONTROL_TYPES = frozenset(('group_start', 'group_end'))
+
+
+class Paginator:
+    """Places fields on pages using the size they actually take up.
+
+    Fields are laid out one block at a time, where a block is a single
+    field or a run of labels kept with the field after them. Each block is drawn
+    tentatively on the layout canvas. If it runs past the bottom margin it
+    is rolled back and drawn again at the top of a new page. Inside a
+    group the whole row moves. A block only moves if it would fit on an
+    empty page. A taller one is placed one field at a time, and a label
+    too tall for any page is split like a splittable one. Splittable
+    labels break themselves with widow/orphan control (see LabelManager)
+    and option lists break between their rows through row_break(). Pages no block
+    can roll back to any more are handed on with c.finish_pages().
+    """
+    def __init__(self, generator):
+        self.generator = generator
+        self._row_mark = None
+        # Whether the block being drawn broke between a field's rows
+        self._split = False
+
+    def place_fields(self, c, fields):
+        self._row_mark = None
+        index = 0
+        while index < len(fields):
+            end = self._block_end(fields, index)
+            self._place_block(c, fields, index, end)
+            index = end
+
+    # ---------- blocks ----------
+
+    def _block_end(self, fields, index):
+        """End of the block starting at index: a label keeps the field after it with it.
+
+        Only the last of several labels in a row joins the field, so a run
+        of labels still breaks between them.
+        """
+        if self._keeps_with_next(fields[index]):
+            next_index = self._next_drawn(fields, index + 1)
+            if next_index is not None and fields[next_index].type != 'label':
+                return next_index + 1
+        return index + 1
+
+    def _keeps_with_next(self, field):
+        return field.type == 'label' and not field.has_html(HTML_SPLIT)
+
+    def _next_drawn(self, fields, index):
+        for next_index in range(index, len(fields)):
+            next_type = fields[next_index].type
+            if next_type not in SUBMISSION_TYPES and next_type not in GROUP_CONTROL_TYPES:
+                return next_index
+        return None
+
+    def _place_block(self, c, fields, start, end):
+        generator = self.generator
+        if all(field.type in GROUP_CONTROL_TYPES or field.type in SUBMISSION_TYPES
+               for field in fields[start:end]):
+            self._draw_range(c, fields, start, end)
+            return
+
+        mark = self._checkpoint(c)
+        grid = generator.group_grid
+        mid_row = grid is not None and grid.column > 0
+        if grid is not None and not mid_row:
+            self._row_mark = (start, mark, grid)
+
+        # Nothing before the oldest point this block can roll back to changes again
+        oldest = mark
+        if mid_row and self._row_mark is not None and self._row_mark[2] is grid:
+            oldest = self._row_mark[1]
+        c.finish_pages(oldest[0][0] - 1)
+
+        self._split = False
+        self._draw_range(c, fields, start, end)
+        if self._fits(c, mark, fields, start, end):
+            return
+
+        # Move the block to a new page, together with the start of its group row
+        block_mark = mark
+        first = start
+        if mid_row and self._row_mark is not None and self._row_mark[2] is grid:
+            first, mark = self._row_mark[0], self._row_mark[1]
+        if self._at_page_top(mark) or not self._fits_empty_page(c, mark):
+            # Too tall for any page: break it up rather than run off this one
+            if end - start > 1:
+                self._rollback(c, block_mark)
+                for index in range(start, end):
+                    self._place_block(c, fields, index, index + 1)
+            elif self._keeps_with_next(fields[start]):
+                self._rollback(c, block_mark)
+                self._draw_split_label(c, fields, start)
+            return
+
+        self._rollback(c, mark)
+        generator.page_manager.new_page(c)
+        if generator.group_grid is not None:
+            generator.group_grid.restart(generator.current_y)
+            self._row_mark = (first, self._checkpoint(c), generator.group_grid)
+        self._split = False
+        self._draw_range(c, fields, first, end)
+
+    def _draw_split_label(self, c, fields, index):
+        """Draw a keep-together label with widow/orphan splitting instead"""
+        label_manager = self.generator.label_manager
+        label_manager.force_split = True
+        try:
+            self._draw_one(c, fields, index)
+        finally:
+            label_manager.force_split = False
+
+    def row_break(self, c, y, height):
+        """Where a field that splits itself puts its next row of height.
+
+        Returns y, or the top of the next page if the row would cross the
+        bottom margin; the page is finished with page_manager.new_page() and
+        a group carries on in the same column. A field's first row never
+        breaks, so it stays with its label, and nothing breaks once the
+        page has overflowed: the whole block then moves instead. The
+        caller restores its font and colour after a break.
+        """
+        generator = self.generator
+        if (y - height >= generator.margin_bottom or y < generator.margin_bottom
+                or y >= generator.page_top_y):
+            return y
+
+        generator.page_manager.new_page(c)
+        if generator.group_grid is not None:
+            generator.group_grid.continue_row(generator.current_y)
+            # The row's earlier fields stay behind on the previous page
+            self._row_mark = None
+        self._split = True
+        return generator.current_y
+
+    def _draw_range(self, c, fields, start, end):
+        for index in range(start, end):
+            self._draw_one(c, fields, index)
+
+    def _draw_one(self, c, fields, index):
+        generator = self.generator
+        field = fields[index]
+        field_type = field.type
+
+        # Skip submission fields
+        if field_type in SUBMISSION_TYPES:
+            return
+
+        prev_field_type = fields[index - 1].type if index > 0 else None
+        next_field_type = fields[index + 1].type if index + 1 < len(fields) else None
+
+        # Force a full-width row for specific fields or a radio between text fields
+        # full_width covers FULL_WIDTH_FIELDS and the Women Only label
+        if (field.full_width or
+            (field_type == 'radio' and
+            (prev_field_type == 'text' or next_field_type == 'text') and
+            generator.current_group is None)):
+
+            # Temporarily end current group if any
+            temp_group = generator.current_group
+            if generator.current_group:
+                generator.group_field.end_group()
+                generator.current_group = None
+
+            # Draw the field as full-width
+            generator._draw_field(c, field)
+
+            # Restore the group if we temporarily ended it
+            if temp_group:
+                generator.group_field.start_group(temp_group)
+            return
+
+        generator._draw_field(c, field)
+
+    # ---------- measuring ----------
+
+    def _fits(self, c, mark, fields, start, end):
+        generator = self.generator
+        page_count = mark[0][0]
+
+        if c.getPageNumber() != page_count:
+            # A field that broke between its rows placed each of them itself
+            if self._split:
+                return True
+            # Only a splittable label may run onto the next page, and only
+            # if what comes before it still has its first lines for company
+            last = fields[end - 1]
+            if not (last.type == 'label' and last.has_html(HTML_SPLIT)):
+                return False
+            return end - start == 1 or generator.label_manager.first_line_page in (None, page_count)
+
+        bottom = c.content_bottom(mark[0])
+        return bottom is None or bottom >= generator.margin_bottom
+
+    def _fits_empty_page(self, c, mark):
+        """Whether the block drawn since mark is no taller than a fresh page"""
+        generator = self.generator
+        if c.getPageNumber() != mark[0][0]:
+            return True
+        bottom = c.content_bottom(mark[0])
+        if bottom is None:
+            return True
+        page_top = generator.page_manager.content_top(generator.current_page + 1)
+        return c.content_top(mark[0]) - bottom <= page_top - generator.margin_bottom
+
+    def _at_page_top(self, mark):
+        """Whether nothing was drawn on the page before mark.
+
+        Judged from the canvas rather than current_y, which fields inside
+        a group don't advance.
+        """
+        canvas_mark, page_start = mark[0], mark[4]
+        return page_start is not None and canvas_mark[:2] == page_start[:2]
+
+    def _checkpoint(self, c):
+        generator = self.generator
+        grid = generator.group_grid
+        return (c.checkpoint(), generator.current_y, generator.current_page, generator.page_top_y,
+                generator.page_start, generator.current_group, grid,
+                grid.snapshot() if grid is not None else None)
+
+    def _rollback(self, c, mark):
+        generator = self.generator
+        (canvas_mark, generator.current_y, generator.current_page, generator.page_top_y,
+         generator.page_start, generator.current_group, grid, grid_state) = mark
+        generator.group_grid = grid
+        if grid is not None:
+            grid.restore(grid_state)
+        c.rollback(canvas_mark)
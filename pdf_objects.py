@@ -0,0 +1,520 @@
+# pdf_objects.py - Minimal PDF object access and append-only incremental updates
+import mmap
+import re
+import zlib
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)\s+%%EOF')
+_OBJ_HEADER_RE = re.compile(rb'(\d+)\s+(\d+)\s+obj\b\s*')
+_STREAM_RE = re.compile(rb'>>\s*stream(\r\n|\n|\r)')
+_LENGTH_RE = re.compile(rb'/Length\s+(\d+)(?!\s+\d+\s+R)')
+_REF_RE = re.compile(rb'(\d+)\s+(\d+)\s+R')
+_ID_RE = re.compile(rb'/ID\s*\[\s*(<[0-9A-Fa-f]*>)\s*(<[0-9A-Fa-f]*>)\s*\]')
+_TOKEN_RE = re.compile(rb'[^\s()<>\[\]{}/%]*')
+_REF_TAIL_RE = re.compile(rb'\s+\d+\s+R(?![^\s()<>\[\]{}/%])')
+_WHITESPACE = b' \t\r\n\f\x00'
+_EOL_RE = re.compile(rb'[\r\n]')
+_INT_ARRAY_RE = re.compile(rb'\d+')
+
+
+class PDFParseError(ValueError):
+    """Raised when a PDF does not have the structure we know how to patch"""
+
+
+def _trailer_ref(trailer, key):
+    m = re.search(rb'/' + key + rb'\s+(\d+)\s+(\d+)\s+R', trailer)
+    return int(m.group(1)) if m else None
+
+
+def _trailer_int(trailer, key):
+    m = re.search(rb'/' + key + rb'\s+(\d+)', trailer)
+    return int(m.group(1)) if m else None
+
+
+class PDFFile:
+    """Read-only view of a PDF's cross-reference data and object bodies.
+
+    Handles classic xref tables and cross-reference streams, including
+    files that already carry incremental updates (the /Prev chain). Newer
+    sections win. Objects packed in object streams are read by inflating
+    their stream once. ``data`` may be bytes or a read-only mmap; only the
+    xref sections and the objects asked for are ever read.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.offsets = {}
+        # object number -> (object stream number, index in that stream)
+        self.compressed = {}
+        self.xref_stream = False
+        self._object_streams = {}
+
+        tail = data[-2048:]
+        matches = list(_STARTXREF_RE.finditer(tail))
+        if not matches:
+            raise PDFParseError("startxref not found")
+        self.startxref = int(matches[-1].group(1))
+
+        self.trailer = None
+        xref_offset = self.startxref
+        seen = set()
+        while xref_offset is not None and xref_offset not in seen:
+            seen.add(xref_offset)
+            trailer = self._read_xref_section(xref_offset)
+            if self.trailer is None:
+                self.trailer = trailer
+            xref_offset = _trailer_int(trailer, b'Prev')
+
+        self.root = _trailer_ref(self.trailer, b'Root')
+        self.info = _trailer_ref(self.trailer, b'Info')
+        self.size = _trailer_int(self.trailer, b'Size') or (max(self.offsets) + 1 if self.offsets else 1)
+        id_match = _ID_RE.search(self.trailer)
+        self.ids = id_match.groups() if id_match else None
+
+    def _read_xref_section(self, offset):
+        data = self.data
+        if data[offset:offset + 4] != b'xref':
+            return self._read_xref_stream(offset)
+        pos = offset + 4
+        trailer_pos = data.find(b'trailer', pos)
+        if trailer_pos < 0:
+            raise PDFParseError("xref table without trailer")
+
+        lines = data[pos:trailer_pos].split()
+        i = 0
+        while i + 1 < len(lines):
+            start, count = int(lines[i]), int(lines[i + 1])
+            i += 2
+            for num in range(start, start + count):
+                entry_offset, _, kind = lines[i], lines[i + 1], lines[i + 2]
+                i += 3
+                if kind == b'n' and num not in self.offsets:
+                    self.offsets[num] = int(entry_offset)
+
+        end = data.find(b'startxref', trailer_pos)
+        return data[trailer_pos:end if end >= 0 else len(data)]
+
+    def _read_xref_stream(self, offset):
+        """Read a cross-reference stream; its dictionary doubles as the trailer"""
+        m = _OBJ_HEADER_RE.match(self.data, offset)
+        if not m:
+            raise PDFParseError(f"no xref table at offset {offset}")
+        body = self._body_at(int(m.group(1)), offset)
+        trailer = body[:_container_end(body, _skip_whitespace(body, 0))]
+        if dict_get(trailer, 'Type') != b'/XRef':
+            raise PDFParseError(f"no xref table at offset {offset}")
+        self.xref_stream = True
+
+        widths = [int(w) for w in _INT_ARRAY_RE.findall(dict_get(trailer, 'W') or b'')]
+        if len(widths) != 3:
+            raise PDFParseError("xref stream without a valid /W")
+        index = dict_get(trailer, 'Index')
+        index = [int(n) for n in _INT_ARRAY_RE.findall(index)] if index else [0, _trailer_int(trailer, b'Size')]
+        rows = stream_data(body)
+
+        pos = 0
+        for start, count in zip(index[::2], index[1::2]):
+            for num in range(start, start + count):
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(rows[pos:pos + width], 'big'))
+                    pos += width
+                # A zero-width type field defaults to 1 (in use)
+                kind = fields[0] if widths[0] else 1
+                if num in self.offsets or num in self.compressed:
+                    continue
+                if kind == 1:
+                    self.offsets[num] = fields[1]
+                elif kind == 2:
+                    self.compressed[num] = (fields[1], fields[2])
+        return trailer
+
+    def object_span(self, num):
+        """Return (start, end) of the object's body, between 'obj' and 'endobj'.
+
+        Only for objects stored directly in the file, not in object streams.
+        """
+        offset = self.offsets.get(num)
+        if offset is None:
+            raise KeyError(f"object {num} not in xref")
+        return self._span_at(num, offset)
+
+    def _body_at(self, num, offset):
+        start, end = self._span_at(num, offset)
+        return self.data[start:end].rstrip()
+
+    def _span_at(self, num, offset):
+        m = _OBJ_HEADER_RE.match(self.data, offset)
+        if not m or int(m.group(1)) != num:
+            raise PDFParseError(f"object {num} not found at offset {offset}")
+        start = m.end()
+
+        endobj = self.data.find(b'endobj', start)
+        stream = _STREAM_RE.search(self.data, start, endobj if endobj >= 0 else len(self.data))
+        if stream:
+            # Skip binary stream data by its declared length
+            length = _LENGTH_RE.search(self.data, start, stream.start() + 2)
+            if length:
+                endobj = self.data.find(b'endobj', stream.end() + int(length.group(1)))
+        if endobj < 0:
+            raise PDFParseError(f"object {num} is not terminated")
+        return start, endobj
+
+    def object_bytes(self, num):
+        if num in self.compressed:
+            stream_num, index = self.compressed[num]
+            return self._object_stream(stream_num)[index]
+        start, end = self.object_span(num)
+        return self.data[start:end].rstrip()
+
+    def _object_stream(self, num):
+        """Bodies of the objects packed in object stream num, inflated once"""
+        bodies = self._object_streams.get(num)
+        if bodies is None:
+            body = self.object_bytes(num)
+            count = _trailer_int(body, b'N')
+            first = _trailer_int(body, b'First')
+            content = stream_data(body)
+            header = [int(n) for n in content[:first].split()]
+            offsets = [first + offset for offset in header[1::2]][:count]
+            bodies = [content[start:end].strip()
+                      for start, end in zip(offsets, offsets[1:] + [len(content)])]
+            self._object_streams[num] = bodies
+        return bodies
+
+    def iter_objects(self):
+        """Yield (num, body) for every object in the file"""
+        for num in sorted(set(self.offsets) | set(self.compressed)):
+            yield num, self.object_bytes(num)
+
+
+def pdf_string(value):
+    """Encode a Python string as a PDF string literal"""
+    text = str(value)
+    try:
+        raw = text.encode('latin-1')
+    except UnicodeEncodeError:
+        # Text outside PDFDocEncoding goes in as UTF-16BE with a BOM
+        return b'<FEFF' + text.encode('utf-16-be').hex().upper().encode('ascii') + b'>'
+    raw = raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    raw = raw.replace(b'\r', b'\\r').replace(b'\n', b'\\n')
+    return b'(' + raw + b')'
+
+
+def pdf_name(value):
+    """Encode a Python string as a PDF name, escaping delimiter characters"""
+    out = bytearray(b'/')
+    for byte in str(value).encode('utf-8'):
+        if byte < 33 or byte > 126 or byte in b'#()<>[]{}/%':
+            out += b'#%02X' % byte
+        else:
+            out.append(byte)
+    return bytes(out)
+
+
+def _skip_whitespace(body, pos):
+    while pos < len(body) and body[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _string_end(body, pos):
+    """Index just past the literal string starting at pos"""
+    depth = 0
+    while pos < len(body):
+        char = body[pos]
+        if char == 0x5C:        # backslash escapes the next byte
+            pos += 2
+            continue
+        if char == 0x28:
+            depth += 1
+        elif char == 0x29:
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+    raise PDFParseError("unterminated string")
+
+
+def _container_end(body, pos):
+    """Index just past the dictionary or array starting at pos"""
+    depth = 0
+    while pos < len(body):
+        if body.startswith(b'<<', pos):
+            depth += 1
+            pos += 2
+            continue
+        if body.startswith(b'>>', pos):
+            depth -= 1
+            pos += 2
+            if depth == 0:
+                return pos
+            continue
+        char = body[pos]
+        if char == 0x5B:
+            depth += 1
+        elif char == 0x5D:
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        elif char == 0x28:
+            pos = _string_end(body, pos)
+            continue
+        elif char == 0x3C:
+            pos = body.index(b'>', pos) + 1
+            continue
+        elif char == 0x25:
+            newline = _EOL_RE.search(body, pos)
+            pos = newline.start() if newline else len(body)
+            continue
+        pos += 1
+    raise PDFParseError("unterminated dictionary or array")
+
+
+def _value_end(body, pos):
+    """Index just past the PDF value starting at pos"""
+    if body.startswith(b'<<', pos) or body.startswith(b'[', pos):
+        return _container_end(body, pos)
+    if body.startswith(b'(', pos):
+        return _string_end(body, pos)
+    if body.startswith(b'<', pos):
+        return body.index(b'>', pos) + 1
+    if body.startswith(b'/', pos):
+        return _TOKEN_RE.match(body, pos + 1).end()
+
+    end = _TOKEN_RE.match(body, pos).end()
+    if end == pos:
+        raise PDFParseError(f"no value at offset {pos}")
+    # An integer may be the object number of an indirect reference
+    ref = _REF_TAIL_RE.match(body, end) if body[pos:end].isdigit() else None
+    return ref.end() if ref else end
+
+
+def _dict_entries(body):
+    """Yield (key, value_start, value_end) for each top-level dictionary entry"""
+    pos = _skip_whitespace(body, 0)
+    if not body.startswith(b'<<', pos):
+        raise PDFParseError("object is not a dictionary")
+    pos += 2
+    while True:
+        pos = _skip_whitespace(body, pos)
+        if body.startswith(b'>>', pos):
+            return
+        if not body.startswith(b'/', pos):
+            raise PDFParseError(f"expected a dictionary key at offset {pos}")
+        key_end = _value_end(body, pos)
+        value_start = _skip_whitespace(body, key_end)
+        value_end = _value_end(body, value_start)
+        yield body[pos + 1:key_end], value_start, value_end
+        pos = value_end
+
+
+def dict_get(body, key):
+    """Raw value of a top-level dictionary entry, or None"""
+    key = key.encode('ascii') if isinstance(key, str) else key
+    for entry_key, start, end in _dict_entries(body):
+        if entry_key == key:
+            return body[start:end]
+    return None
+
+
+def dict_set(body, key, value):
+    """Return body with a top-level dictionary entry replaced or added.
+
+    ``value`` is the raw PDF value, e.g. ``b'true'`` or ``b'12 0 R'``.
+    Anything after the dictionary (such as stream data) is kept as is.
+    """
+    key = key.encode('ascii') if isinstance(key, str) else key
+    for entry_key, start, end in _dict_entries(body):
+        if entry_key == key:
+            return body[:start] + value + body[end:]
+    dict_end = _container_end(body, _skip_whitespace(body, 0))
+    return body[:dict_end - 2] + b'/' + key + b' ' + value + b'\n' + body[dict_end - 2:]
+
+
+def ref_number(value):
+    """Object number of an indirect reference value like b'12 0 R', or None"""
+    m = _REF_RE.fullmatch(value.strip()) if value else None
+    return int(m.group(1)) if m else None
+
+
+def _unpredict(data, parms):
+    """Undo a PNG predictor (only None and Up rows, as xref streams use)"""
+    predictor = _trailer_int(parms, b'Predictor') or 1
+    if predictor < 10:
+        return data
+    columns = _trailer_int(parms, b'Columns') or 1
+    out = bytearray()
+    previous = bytes(columns)
+    for pos in range(0, len(data), columns + 1):
+        kind, row = data[pos], data[pos + 1:pos + 1 + columns]
+        if kind == 2:
+            row = bytes((a + b) & 0xFF for a, b in zip(row, previous))
+        elif kind != 0:
+            raise PDFParseError(f"unsupported PNG predictor row type {kind}")
+        out += row
+        previous = row
+    return bytes(out)
+
+
+def stream_data(body):
+    """Decoded content of a stream object body (unfiltered or FlateDecode)"""
+    dict_end = _container_end(body, _skip_whitespace(body, 0))
+    stream = _STREAM_RE.match(body, dict_end - 2)
+    if not stream:
+        raise PDFParseError("object is not a stream")
+    length = _trailer_int(body[:dict_end], b'Length')
+    content = body[stream.end():stream.end() + length]
+
+    filters = dict_get(body[:dict_end], 'Filter') or b''
+    if b'/FlateDecode' in filters:
+        content = zlib.decompress(content)
+    elif filters.strip(b'[] \n'):
+        raise PDFParseError(f"unsupported stream filter {filters!r}")
+    parms = dict_get(body[:dict_end], 'DecodeParms')
+    return _unpredict(content, parms) if parms else content
+
+
+def xref_stream(entries, trailer, level=6):
+    """Body of a cross-reference stream object.
+
+    ``entries`` maps object number to (type, field 2, field 3) as in the
+    PDF spec: (1, offset, 0) for objects in the file, (2, object stream,
+    index) for packed ones. ``trailer`` holds the raw trailer entries
+    (Size, Root, Info, ID, Prev) that the stream dictionary carries.
+    """
+    nums = sorted(entries)
+    width = max(1, (max(max(entry[1] for entry in entries.values()), 1).bit_length() + 7) // 8)
+    index = []
+    rows = bytearray()
+    for start, run in _xref_subsections(nums):
+        index.append(b'%d %d' % (start, len(run)))
+        for num in run:
+            kind, field2, field3 = entries[num]
+            rows.append(kind)
+            rows += field2.to_bytes(width, 'big')
+            rows += field3.to_bytes(2, 'big')
+    content = zlib.compress(bytes(rows), level)
+
+    head = [b'<<\n/Type /XRef /W [1 %d 2] /Index [%s]' % (width, b' '.join(index))]
+    head.extend(b'/%s %s' % (key.encode('ascii'), value) for key, value in trailer.items())
+    head.append(b'/Filter /FlateDecode /Length %d\n>>\nstream\n' % len(content))
+    return b'\n'.join(head) + content + b'\nendstream'
+
+
+def _xref_subsections(nums):
+    """Group sorted object numbers into contiguous (start, [nums]) runs"""
+    runs = []
+    for num in nums:
+        if runs and runs[-1][0] + len(runs[-1][1]) == num:
+            runs[-1][1].append(num)
+        else:
+            runs.append((num, [num]))
+    return runs
+
+
+def update_section(pdf, objects, root=None, info=None):
+    """Bytes of an incremental update to append after pdf.data.
+
+    ``objects`` maps object number to its new body (the bytes between
+    ``obj`` and ``endobj``). New object numbers must start at the file's
+    current /Size. Only the patch is built, so the cost depends on the
+    size of the patch, not of the document. Files indexed by an xref
+    stream get their update indexed by one too.
+    """
+    out = []
+    pos = len(pdf.data)
+    if pdf.data[-1:] != b'\n':
+        out.append(b'\n')
+        pos += 1
+
+    offsets = {}
+    for num in sorted(objects):
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (num, objects[num])
+        offsets[num] = pos
+        out.append(chunk)
+        pos += len(chunk)
+
+    size = max(pdf.size, max(offsets) + 1 if offsets else 0)
+    if pdf.xref_stream:
+        trailer = {'Size': b'%d' % (size + 1), 'Root': b'%d 0 R' % (root or pdf.root)}
+        if info or pdf.info:
+            trailer['Info'] = b'%d 0 R' % (info or pdf.info)
+        if pdf.ids:
+            trailer['ID'] = b'[%s%s]' % pdf.ids
+        trailer['Prev'] = b'%d' % pdf.startxref
+        entries = {num: (1, offset, 0) for num, offset in offsets.items()}
+        entries[size] = (1, pos, 0)
+        out.append(b'%d 0 obj\n%s\nendobj\n' % (size, xref_stream(entries, trailer)))
+        out.append(b'startxref\n%d\n%%%%EOF\n' % pos)
+        return b''.join(out)
+
+    xref = [b'xref\n']
+    for start, nums in _xref_subsections(sorted(offsets)):
+        xref.append(b'%d %d\n' % (start, len(nums)))
+        xref.extend(b'%010d 00000 n \n' % offsets[num] for num in nums)
+    out.extend(xref)
+
+    trailer = [b'trailer\n<<\n/Size %d\n/Root %d 0 R\n' % (size, root or pdf.root)]
+    if info or pdf.info:
+        trailer.append(b'/Info %d 0 R\n' % (info or pdf.info))
+    if pdf.ids:
+        trailer.append(b'/ID [%s%s]\n' % pdf.ids)
+    trailer.append(b'/Prev %d\n>>\nstartxref\n%d\n%%%%EOF\n' % (pdf.startxref, pos))
+    out.extend(trailer)
+    return b''.join(out)
+
+
+def append_update(data, objects, pdf=None, root=None, info=None):
+    """Append changed objects to a PDF as an incremental update (see update_section)"""
+    return data + update_section(pdf or PDFFile(data), objects, root, info)
+
+
+def update_pdf_file(path, patch):
+    """Apply a small patch to the PDF file at path as an incremental update.
+
+    ``patch(pdf)`` receives a PDFFile over a read-only map of the file and
+    returns ``{object number: new body}``, optionally paired with new
+    ``root``/``info`` object numbers as ``(objects, root, info)``. Only
+    those objects, an xref section and a trailer are appended; the rest
+    of the file is neither read nor rewritten. Returns the number of bytes
+    appended (0 if the patch had nothing to change).
+    """
+    with open(path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pdf = PDFFile(data)
+            result = patch(pdf)
+            objects, root, info = result if isinstance(result, tuple) else (result, None, None)
+            if not objects:
+                return 0
+            tail = update_section(pdf, objects, root, info)
+        f.seek(0, 2)
+        f.write(tail)
+    return len(tail)
+
+
+def set_need_appearances(pdf):
+    """update_pdf_file() patch: set /NeedAppearances true on the AcroForm.
+
+    Adds an empty AcroForm if the document has none.
+    """
+    catalog = pdf.object_bytes(pdf.root)
+    acro_form = dict_get(catalog, 'AcroForm')
+    num = ref_number(acro_form)
+
+    if num is not None:
+        body = pdf.object_bytes(num)
+        if dict_get(body, 'NeedAppearances') == b'true':
+            return {}
+        return {num: dict_set(body, 'NeedAppearances', b'true')}
+
+    if acro_form is not None:
+        # Inline AcroForm dictionary in the catalog
+        if dict_get(acro_form, 'NeedAppearances') == b'true':
+            return {}
+        acro_form = dict_set(acro_form, 'NeedAppearances', b'true')
+        return {pdf.root: dict_set(catalog, 'AcroForm', acro_form)}
+
+    num = pdf.size
+    return {
+        num: b'<<\n/Fields [] /NeedAppearances true\n>>',
+        pdf.root: dict_set(catalog, 'AcroForm', b'%d 0 R' % num),
+    }
@@ -0,0 +1,131 @@
+# pdf_stream_writer.py - Write a ReportLab document out page by page
+from reportlab import rl_config
+from reportlab.pdfbase import pdfdoc
+
+from page_compression import compress_page
+
+# Objects that never change once created, so they can be written as soon
+# as they appear: appearance streams and images
+_FINISHED_TYPES = (pdfdoc.PDFStream, pdfdoc.PDFImageXObject)
+
+
+class StreamingPDFWriter:
+    """Writes a canvas's PDF to a sink while the pages are still being drawn.
+
+    Call page_done() after each showPage(). The finished page's content
+    stream, its widget annotations and any appearance streams or images
+    they use are formatted by ReportLab and written in one call; the
+    content stream is then dropped from memory. Objects that can still
+    change (page dictionaries, which name form XObjects defined after the
+    last page, radio groups, fonts, the page tree, AcroForm and catalog)
+    are written by finish(), followed by the xref table and trailer.
+
+    Objects are numbered as ReportLab registers them, so the file is
+    equivalent to canvas.save() output but not byte-identical.
+    """
+    def __init__(self, c, write, compression_level=None):
+        self.canvas = c
+        self.doc = c._doc
+        self.write = write
+        self.compression_level = compression_level
+        if not isinstance(self.doc.encrypt, pdfdoc.NoEncryption):
+            raise ValueError("streaming output does not support encryption")
+
+        # object number -> file offset of everything written so far
+        self.offsets = {}
+        self.pos = 0
+        # Bytes of the current page, handed to the sink in one write
+        self._pending = []
+        self._pages_done = 0
+        self._scanned = 0
+        # The same header line ReportLab writes
+        self._emit(pdfdoc.PDFFile(self.doc._pdfVersion).strings[0])
+
+    def _emit(self, data):
+        self._pending.append(data)
+        self.pos += len(data)
+
+    def _flush(self):
+        if self._pending:
+            self.write(b''.join(self._pending))
+            self._pending = []
+
+    def _write_object(self, name):
+        doc = self.doc
+        num = doc.idToObjectNumberAndVersion[name][0]
+        if num in self.offsets:
+            return
+        obj = doc.idToObject[name]
+        data = pdfdoc.PDFIndirectObject(name, obj).format(doc)
+        if not rl_config.invariant and rl_config.pdfComments:
+            data = pdfdoc.pdfdocEnc("%% %s: class %s \n" % (ascii(name), obj.__class__.__name__[:50])) + data
+        self.offsets[num] = self.pos
+        self._emit(data)
+
+    def _write_finished_objects(self):
+        """Write streams and images registered since the last call"""
+        doc = self.doc
+        while self._scanned < doc.objectcounter:
+            self._scanned += 1
+            name = doc.numberToId[self._scanned]
+            if isinstance(doc.idToObject[name], _FINISHED_TYPES):
+                self._write_object(name)
+
+    def page_done(self):
+        """Write every page finished since the last call"""
+        doc = self.doc
+        pages = doc.Pages.pages
+        for page in pages[self._pages_done:]:
+            if self.compression_level is not None and not page.Contents and page.stream:
+                compress_page(page, self.compression_level)
+            # Builds Contents, Resources and the Annots array as save() would
+            page.check_format(doc)
+
+            ref = doc.Reference(page.Contents)
+            self._write_object(ref.name)
+            # Keep only the reference; the page's content is on its way out
+            page.Contents = ref
+            page.stream = None
+            doc.idToObject[ref.name] = None
+
+            if page.Annots is not None:
+                for annot in page.Annots.sequence:
+                    self._write_object(annot.name)
+        self._pages_done = len(pages)
+        self._write_finished_objects()
+        self._flush()
+
+    def finish(self):
+        """Write the remaining objects, xref table and trailer"""
+        c = self.canvas
+        doc = self.doc
+        if len(c._code):
+            c.showPage()
+        self.page_done()
+
+        # The rest of PDFDocument.GetPDFData()/format(), skipping what is
+        # already written
+        for font in doc.delayedFonts:
+            font.addObjects(doc)
+        doc.info.invariant = doc.invariant
+        doc.info.digest(doc.signature)
+        root = doc.Reference(doc.Catalog)
+        info = doc.Reference(doc.info)
+        doc.Outlines.prepare(doc, c)
+        if doc.Outlines.ready < 0:
+            doc.Catalog.Outlines = None
+
+        # Formatting may register new objects, so walk until exhausted
+        num = 1
+        while num in doc.numberToId:
+            self._write_object(doc.numberToId[num])
+            num += 1
+
+        xref_offset = self.pos
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % num]
+        xref.extend(b'%010d 00000 n \n' % self.offsets[n] for n in range(1, num))
+        self._emit(b''.join(xref))
+        trailer = pdfdoc.PDFTrailer(startxref=xref_offset, Size=num, Root=root, Info=info, ID=doc.ID())
+        self._emit(trailer.format(doc))
+        self._flush()
+        return self.pos
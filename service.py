@@ -0,0 +1,191 @@
+# service.py - Local HTTP rendering service backed by warmed worker processes
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Seconds a request may wait for a worker and render before getting a 504
+REQUEST_TIMEOUT = 30
+
+# Largest form definition accepted, in bytes
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# Rendered by every worker at start-up so the first real request finds
+# ReportLab, the font metrics and the checkbox/radio appearances loaded
+WARMUP_FORM = {
+    'warmup': {
+        'content': {
+            'warmup': {
+                'form_name': 'Warm-up',
+                'fields': [
+                    {'name': 'name', 'label': 'Name', 'type': 'text'},
+                    {'name': 'notes', 'label': 'Notes', 'type': 'textarea'},
+                    {'name': 'pick', 'label': 'Pick', 'type': 'select', 'option': ['A', 'B']},
+                    {'name': 'boxes', 'label': 'Boxes', 'type': 'checkbox', 'option': {'a': 'A', 'b': 'B'}},
+                    {'name': 'radio', 'label': 'Radio', 'type': 'radio', 'option': {'a': 'A', 'b': 'B'}},
+                ],
+            },
+        },
+    },
+}
+
+# Generator options for this worker process, set by _warm_worker
+_worker_options = {}
+
+
+def _render(form_data):
+    """Render a parsed form definition in a worker; returns (pdf bytes, page count)"""
+    from jsonToPDF import ModernPDFFormGenerator
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator = ModernPDFFormGenerator(form_data, **_worker_options)
+        pdf = generator.generate_pdf_bytes()
+    return pdf, generator.page_count
+
+
+def _warm_worker(options):
+    global _worker_options
+    _worker_options = options
+    _render(WARMUP_FORM)
+
+
+def _ready():
+    return os.getpid()
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP server that hands each render to a pool of warmed worker processes"""
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, request_timeout=REQUEST_TIMEOUT,
+                 max_body_bytes=MAX_BODY_BYTES, **generator_options):
+        self.workers = workers or os.cpu_count() or 1
+        self.request_timeout = request_timeout
+        self.max_body_bytes = max_body_bytes
+
+        # Import in the parent first so forked workers start with the
+        # modules already loaded
+        import jsonToPDF  # noqa: F401
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                        initargs=(generator_options,))
+        # The pool starts processes on demand; one task each starts them all now
+        wait([self.pool.submit(_ready) for _ in range(self.workers)])
+
+        ThreadingHTTPServer.__init__(self, address, RenderHandler)
+
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.pool.shutdown(cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """POST /render with form JSON returns the PDF; GET /health reports readiness"""
+    server_version = 'JSONToPDF'
+    protocol_version = 'HTTP/1.1'
+    # Socket timeout for reading a request, so a stalled client frees its thread
+    timeout = REQUEST_TIMEOUT
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_error(404, f"no such path: {self.path}")
+            return
+        self._send(200, json.dumps({'status': 'ok', 'workers': self.server.workers}).encode('utf-8'))
+
+    def do_POST(self):
+        if self.path != '/render':
+            self._send_error(404, f"no such path: {self.path}")
+            return
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self._send_error(411, "Content-Length required")
+            return
+        if length < 0:
+            self._send_error(400, "invalid Content-Length")
+            self.close_connection = True
+            return
+        if length > self.server.max_body_bytes:
+            self._send_error(413, f"form JSON larger than {self.server.max_body_bytes} bytes")
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+        # Parsed here so only a malformed body gets a 400, not a render error
+        try:
+            form_data = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self._send_error(400, f"invalid form JSON: {e}")
+            return
+
+        start = time.perf_counter()
+        future = self.server.pool.submit(_render, form_data)
+        try:
+            pdf, pages = future.result(timeout=self.server.request_timeout)
+        except FutureTimeoutError:
+            # A queued render is dropped; one already running finishes in
+            # its worker and the result is discarded
+            future.cancel()
+            self._send_error(504, f"render took longer than {self.server.request_timeout}s")
+            return
+        except Exception as e:
+            self._send_error(500, f"{type(e).__name__}: {e}")
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._send(200, pdf, 'application/pdf', {
+            'X-Page-Count': str(pages),
+            'X-Render-Time-Ms': f'{elapsed_ms:.1f}',
+        })
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None,
+                request_timeout=REQUEST_TIMEOUT, **generator_options):
+    """A RenderServer with its workers started and warmed; call serve_forever()"""
+    return RenderServer((host, port), workers=workers, request_timeout=request_timeout,
+                        **generator_options)
+
+
+def main(argv=None):
+    """Usage: python jsonToPDF.py --serve [--port N] [--workers N] [--timeout S]"""
+    parser = argparse.ArgumentParser(prog='jsonToPDF.py --serve',
+                                     description='Serve PDF rendering over HTTP on localhost')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT, help="seconds per request")
+    parser.add_argument('--compact', action='store_true', help="write object streams (PDF 1.5)")
+    args = parser.parse_args(argv)
+
+    options = {'compact': True} if args.compact else {}
+    server = make_server(args.host, args.port, args.workers, args.timeout, **options)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} with {server.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# text_metrics.py - Shared, memoized text measurement and word wrapping
+from collections import OrderedDict
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from wrap_cache import SHARED_WRAP_MIN_CHARS, get_shared_wrap_cache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, wrapping falls back to pure Python
+    np = None
+
+# Paragraphs with at least this many words are wrapped with NumPy
+NUMPY_WRAP_MIN_WORDS = 400
+
+
+class TextMeasurer:
+    """Caches word widths so wrapping adds up numbers instead of re-measuring.
+
+    Widths are stored per (font, word) in 1/1000 em units, which is how
+    ReportLab's standard fonts define glyph widths. A line's width is then
+    ``units * 0.001 * size``, the same arithmetic ReportLab uses, so the
+    results match ``stringWidth`` exactly and one entry serves every size.
+    The cache is an LRU bounded by ``max_entries``.
+    """
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._widths = OrderedDict()
+        self._space_units = {}
+        self.hits = 0
+        self.misses = 0
+
+    def word_units(self, word, font_name):
+        key = (font_name, word)
+        units = self._widths.get(key)
+        if units is not None:
+            self._widths.move_to_end(key)
+            self.hits += 1
+            return units
+
+        self.misses += 1
+        units = stringWidth(word, font_name, 1000)
+        rounded = round(units)
+        if abs(units - rounded) < 1e-6:
+            units = rounded
+        self._widths[key] = units
+        if len(self._widths) > self.max_entries:
+            self._widths.popitem(last=False)
+        return units
+
+    def space_units(self, font_name):
+        units = self._space_units.get(font_name)
+        if units is None:
+            units = self._space_units[font_name] = self.word_units(' ', font_name)
+        return units
+
+    def string_width(self, text, font_name, font_size):
+        """Width of text in points, from cached word widths"""
+        if not text:
+            return 0
+        parts = text.split(' ')
+        word_units = self.word_units
+        units = sum(word_units(part, font_name) for part in parts if part)
+        units += (len(parts) - 1) * self.space_units(font_name)
+        return units * 0.001 * font_size
+
+    def wrap(self, text, max_width, font_name, font_size):
+        """Greedy word wrap; a word wider than max_width gets its own line"""
+        if not text:
+            return []
+
+        words = text.split()
+        if np is not None and len(words) >= NUMPY_WRAP_MIN_WORDS:
+            lines = self._wrap_numpy(words, max_width, font_name, font_size)
+            if lines is not None:
+                return lines
+        return self._wrap_python(words, max_width, font_name, font_size)
+
+    def _wrap_python(self, words, max_width, font_name, font_size):
+        space = self.space_units(font_name)
+        word_units = self.word_units
+
+        lines = []
+        line_start = 0
+        line_units = 0
+        for i, word in enumerate(words):
+            units = word_units(word, font_name)
+            if i == line_start:
+                line_units = units
+                continue
+            test_units = line_units + space + units
+            if test_units * 0.001 * font_size <= max_width:
+                line_units = test_units
+            else:
+                lines.append(' '.join(words[line_start:i]))
+                line_start = i
+                line_units = units
+
+        if line_start < len(words):
+            lines.append(' '.join(words[line_start:]))
+        return lines
+
+    def _wrap_numpy(self, words, max_width, font_name, font_size):
+        """Batched wrap: one width array, break points found on its prefix sums.
+
+        Only used when every width is a whole number of units, so the prefix
+        sums are exact integers and each line width is the same number the
+        Python loop would have compared. Returns None otherwise.
+        """
+        space = self.space_units(font_name)
+        if not isinstance(space, int):
+            return None
+
+        # Long paragraphs repeat the same words, so measure each one once
+        word_units = self.word_units
+        unique_units = {word: word_units(word, font_name) for word in dict.fromkeys(words)}
+        if not all(isinstance(u, int) for u in unique_units.values()):
+            return None
+        units = np.fromiter(map(unique_units.__getitem__, words), dtype=np.int64, count=len(words))
+
+        # ends[i] = width of words[:i] including one space after each word,
+        # so a line of words[s:e] is ends[e] - ends[s] - space units wide
+        ends = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(units + space, out=ends[1:])
+
+        # Candidate break for every possible line start at once, from the
+        # float limit; the exact greedy break is then a step or two away
+        limit_units = max_width * 1000.0 / font_size
+        guesses = np.searchsorted(ends, ends[:-1] + space + limit_units, side='right') - 1
+        ends = ends.tolist()
+        guesses = guesses.tolist()
+
+        def fits(start, end):
+            return (ends[end] - ends[start] - space) * 0.001 * font_size <= max_width
+
+        count = len(words)
+        lines = []
+        start = 0
+        while start < count:
+            # Step to the break the Python loop would pick, using its comparison
+            end = min(max(guesses[start], start + 1), count)
+            while end < count and fits(start, end + 1):
+                end += 1
+            while end > start + 1 and not fits(start, end):
+                end -= 1
+            lines.append(' '.join(words[start:end]))
+            start = end
+        return lines
+
+    def clear(self):
+        self._widths.clear()
+        self._space_units.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._widths),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+# Process-wide measurer shared by every wrapper
+TEXT_MEASURER = TextMeasurer()
+
+
+def string_width(text, font_name, font_size):
+    return TEXT_MEASURER.string_width(text, font_name, font_size)
+
+
+def wrap_words(text, max_width, font_name, font_size):
+    # Long paragraphs may already have been wrapped by a sibling process
+    shared = get_shared_wrap_cache() if len(text) >= SHARED_WRAP_MIN_CHARS else None
+    if shared is not None:
+        lines = shared.get(text, max_width, font_name, font_size)
+        if lines is not None:
+            return lines
+
+    lines = TEXT_MEASURER.wrap(text, max_width, font_name, font_size)
+    if shared is not None:
+        shared.put(text, max_width, font_name, font_size, lines)
+    return lines
@@ -3,8 +3,8 @@
 import re
 import os
 from reportlab.lib import colors
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
+from text_metrics import wrap_words
+from image_cache import load_image
 
 def _strip_html_tags(text):
     """Remove HTML tags from text"""
@@ -26,79 +26,16 @@ def _get_options(option_data):
     else:
         return []
 
-def _check_page_break(generator, canvas, needed_height):
-    """Check if a new page is needed"""
-    if generator.current_y - needed_height < generator.margin_bottom:
-        canvas.showPage()
-        generator.current_page += 1
-        generator.current_y = generator.page_height - generator.margin_x
-        return True
-    return False
-
-def _calculate_field_height(field_type, label, options, field_width, field_height, label_styles):
-    """Enhanced field height calculation"""
-    if field_type == 'checkbox':
-        # For checkboxes with long text, we need to account for wrapping
-        if isinstance(options, dict) and 'checked' in options:
-            text = options['checked']
-            if text and len(text) > 50:  # Long text needs more height
-                # Rough calculation for wrapped text
-                char_width = 6  # Approximate character width
-                chars_per_line = max(field_width // char_width, 20)
-                lines = len(text) // chars_per_line + 1
-                return max(30, lines * 15)  # Minimum 30, or calculated height
-        return 25
-    elif field_type == 'textarea':
-        return 80
-    elif field_type in ['radio']:
-        option_count = len(_get_options(options)) if options else 2
-        return 20 + (option_count * 18)
-    elif field_type == 'label':
-        if '<h1>' in str(label).lower():
-            return 30
-        elif '<h3>' in str(label).lower():
-            return 25
-        elif '<h4>' in str(label).lower():
-            return 20
-        elif '<p>' in str(label).lower():
-            return 40  # Paragraphs need more space
-        return 15
-    else:
-        return field_height
-
 def _prepare_logo_image(logo_path):
     """Prepare logo image for PDF inclusion"""
-    if not logo_path or not os.path.exists(logo_path):
-        return None
-    
-    try:
-        return ImageReader(logo_path)
-    except Exception as e:
-        print(f"Error preparing logo image: {e}")
-        return None
+    return load_image(logo_path)
 
 def _calculate_logo_dimensions(logo_path, max_width=150, max_height=50):
     """Calculate appropriate logo dimensions for PDF"""
-    if not logo_path or not os.path.exists(logo_path):
+    logo = load_image(logo_path, max_width, max_height)
+    if logo is None:
         return 0, 0
-    
-    try:
-        from PIL import Image
-        with Image.open(logo_path) as img:
-            width, height = img.size
-            
-            # Calculate scaling to fit within max dimensions
-            width_ratio = max_width / width if width > 0 else 1
-            height_ratio = max_height / height if height > 0 else 1
-            scale_ratio = min(width_ratio, height_ratio, 1)  # Don't scale up
-            
-            return int(width * scale_ratio), int(height * scale_ratio)
-    except ImportError:
-        # PIL not available, use default dimensions
-        return max_width, max_height
-    except Exception as e:
-        print(f"Error calculating logo dimensions: {e}")
-        return max_width, max_height
+    return int(logo.width), int(logo.height)
 
 def wrap_text(canvas, text, max_width, font_name="Helvetica", font_size=10):
     """
@@ -107,32 +44,9 @@ def wrap_text(canvas, text, max_width, font_name="Helvetica", font_size=10):
     """
     if not text:
         return [], 0
-    
-    canvas.setFont(font_name, font_size)
-    words = text.split()
-    lines = []
-    current_line = ""
-    
-    for word in words:
-        # Test if adding this word would exceed max width
-        test_line = current_line + (" " if current_line else "") + word
-        text_width = canvas.stringWidth(test_line, font_name, font_size)
-        
-        if text_width <= max_width:
-            current_line = test_line
-        else:
-            # If current line has content, save it and start new line
-            if current_line:
-                lines.append(current_line)
-                current_line = word
-            else:
-                # Single word is too long, force it on the line
-                lines.append(word)
-                current_line = ""
-    
-    # Add the last line if it has content
-    if current_line:
-        lines.append(current_line)
+
+    # Line widths are summed from cached word widths
+    lines = wrap_words(text, max_width, font_name, font_size)
     
     # Calculate total height (font_size + small spacing between lines)
     line_height = font_size + 4
@@ -161,13 +75,10 @@ def draw_wrapped_text(canvas, text, x, y, max_width, font_name="Helvetica", font
     # Get wrapped lines
     lines, total_height = wrap_text(canvas, text, max_width, font_name, font_size)
     
-    # Draw each line
+    # Draw all lines as one text block
     line_height = font_size + 2
-    current_y = y
-    
-    for line in lines:
-        canvas.drawString(x, current_y, line)
-        current_y -= line_height
+    canvas.drawTextLines(x, y, lines, line_height)
+    current_y = y - line_height * len(lines)
     
     # Restore previous state
     canvas.setFont(current_font, current_size)
@@ -187,38 +98,18 @@ def calculate_wrapped_text_height(canvas, text, max_width, font_name="Helvetica"
 
 def get_effective_field_width(generator):
     """Get the effective width for text wrapping based on current context"""
-    if generator.current_group is not None and generator.column_widths:
-        group_index = len(generator.group_fields)
-        column_index = group_index % generator.group_columns
-        effective_width = generator.column_widths[column_index]
+    if generator.current_group is not None:
+        _, effective_width = generator.group_grid.cell()
         return effective_width
     else:
         return generator.field_width
 
 def _wrap_text(text, max_width, font_size=10, font_name="Helvetica"):
-    """Wrap text based on actual string width in points using ReportLab."""
+    """Wrap text based on actual string width in points, using cached word widths."""
     if not text:
         return []
     
-    words = text.split()
-    lines = []
-    current_line = ""
-    
-    for word in words:
-        test_line = current_line + (" " if current_line else "") + word
-        # Measure the width of the test_line
-        line_width = pdfmetrics.stringWidth(test_line, font_name, font_size)
-        if line_width <= max_width:
-            current_line = test_line
-        else:
-            if current_line:
-                lines.append(current_line)
-            current_line = word
-    
-    if current_line:
-        lines.append(current_line)
-    
-    return lines
+    return wrap_words(text, max_width, font_name, font_size)
 
 def format_phone_number(phone):
     """Format phone number for display"""
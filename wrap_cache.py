@@ -0,0 +1,153 @@
+# wrap_cache.py - Wrapped-paragraph cache shared by worker processes
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from array import array
+
+from reportlab import Version as REPORTLAB_VERSION
+
+from constants import VERSION
+from env import get_wrap_cache_path
+
+# Only text at least this long is worth a hash and a shared-memory lookup
+SHARED_WRAP_MIN_CHARS = 200
+
+_MAGIC = b'JTPWRAP1'
+_FILE_HEADER = struct.Struct('<8sII')       # magic, slot size, slot count
+_SLOT_HEADER = struct.Struct('<16sII')      # key digest, payload length, crc32
+
+# Bump when wrapping results could change for the same input
+_KEY_SALT = f"{VERSION}|{REPORTLAB_VERSION}|wrap1".encode('ascii')
+
+
+class SharedWrapCache:
+    """Direct-mapped cache of wrap results in a memory-mapped file.
+
+    Any number of processes can open the same file. Each entry lives in the
+    slot picked by its key digest and replaces whatever was there, so the
+    file never grows past ``slot_size * slot_count``. A line is stored as
+    the number of words it holds, which keeps entries small; the lines are
+    rebuilt from the caller's own text. Writes are not locked: a slot
+    carries a CRC of its key and payload, and a torn or stale slot is just
+    a miss.
+    """
+    def __init__(self, path, slot_size=1024, slot_count=4096):
+        self.path = path
+        self.slot_size = slot_size
+        self.slot_count = slot_count
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        size = _FILE_HEADER.size + slot_size * slot_count
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size == 0:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+
+        # A new file (or one another process is still creating) gets the
+        # header; every opener writes the same bytes
+        if len(self._map) == size and self._map[:len(_MAGIC)] == bytes(len(_MAGIC)):
+            _FILE_HEADER.pack_into(self._map, 0, _MAGIC, slot_size, slot_count)
+
+        magic, file_slot_size, file_slot_count = _FILE_HEADER.unpack_from(self._map, 0)
+        if (magic, file_slot_size, file_slot_count) != (_MAGIC, slot_size, slot_count) or len(self._map) != size:
+            self._map.close()
+            raise ValueError(f"{path} is not a wrap cache with {slot_count} slots of {slot_size} bytes")
+
+    @staticmethod
+    def key(text, max_width, font_name, font_size):
+        digest = hashlib.blake2b(_KEY_SALT, digest_size=16)
+        digest.update(f"|{font_name}|{font_size!r}|{max_width!r}|".encode('utf-8'))
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.digest()
+
+    def _offset(self, digest):
+        slot = int.from_bytes(digest[:8], 'little') % self.slot_count
+        return _FILE_HEADER.size + slot * self.slot_size
+
+    def get(self, text, max_width, font_name, font_size):
+        """Cached lines for this paragraph, or None"""
+        digest = self.key(text, max_width, font_name, font_size)
+        offset = self._offset(digest)
+        slot_digest, length, crc = _SLOT_HEADER.unpack_from(self._map, offset)
+        if slot_digest != digest or length > self.slot_size - _SLOT_HEADER.size:
+            self.misses += 1
+            return None
+
+        start = offset + _SLOT_HEADER.size
+        payload = self._map[start:start + length]
+        if zlib.crc32(payload, zlib.crc32(digest)) != crc:
+            self.misses += 1
+            return None
+
+        counts = array('H')
+        counts.frombytes(payload)
+        words = text.split()
+        if sum(counts) != len(words):
+            self.misses += 1
+            return None
+
+        lines = []
+        position = 0
+        for count in counts:
+            lines.append(' '.join(words[position:position + count]))
+            position += count
+        self.hits += 1
+        return lines
+
+    def put(self, text, max_width, font_name, font_size, lines):
+        """Store wrapped lines; results too large for one slot are skipped"""
+        counts = [len(line.split()) for line in lines]
+        if len(counts) * 2 > self.slot_size - _SLOT_HEADER.size or max(counts, default=0) > 0xFFFF:
+            return False
+
+        digest = self.key(text, max_width, font_name, font_size)
+        payload = array('H', counts).tobytes()
+        offset = self._offset(digest)
+        start = offset + _SLOT_HEADER.size
+        # Payload first; a reader racing this write fails the CRC and misses
+        self._map[start:start + len(payload)] = payload
+        _SLOT_HEADER.pack_into(self._map, offset, digest, len(payload),
+                               zlib.crc32(payload, zlib.crc32(digest)))
+        self.stores += 1
+        return True
+
+    def clear(self):
+        empty = bytes(self.slot_size)
+        for slot in range(self.slot_count):
+            offset = _FILE_HEADER.size + slot * self.slot_size
+            self._map[offset:offset + self.slot_size] = empty
+
+    def close(self):
+        self._map.close()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores
+        }
+
+
+_shared_cache = None
+_shared_cache_opened = False
+
+
+def get_shared_wrap_cache():
+    """Process-wide shared cache, or None unless WRAP_CACHE_PATH is set"""
+    global _shared_cache, _shared_cache_opened
+    if not _shared_cache_opened:
+        _shared_cache_opened = True
+        path = get_wrap_cache_path()
+        if path:
+            try:
+                _shared_cache = SharedWrapCache(path)
+            except (OSError, ValueError) as e:
+                print(f"Shared wrap cache disabled: {e}")
+    return _shared_cache